@@ -1,21 +1,12 @@
 #main.py
 
-import os
 import logging
-from telegram.ext import Application, CommandHandler, CallbackQueryHandler
 from src.bot import main as bot_main
+from src.logging_setup import configure_logging
+from src.config import ConfigManager
 
-# Create logs directory if it doesn't exist
-log_dir = 'logs'
-os.makedirs(log_dir, exist_ok=True)
-
-# Настройка логирования
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', 
-    level=logging.INFO,  # Можно изменить на DEBUG для более подробной информации
-    filename=os.path.join(log_dir, 'bot.log'),  # Абсолютный путь к файлу логов
-    filemode='a'  # Append mode
-)
+# Настройка логирования (уровень, файл, ротация и формат задаются в config.yaml)
+configure_logging(ConfigManager.shared().get_config('logging'))
 
 logger = logging.getLogger(__name__)
 
@@ -24,7 +15,7 @@ def main():
         logger.info("Запуск телеграм-бота")
         bot_main()
     except Exception as e:
-        logger.error(f"Ошибка при запуске бота: {e}", exc_info=True)
+        logger.error("Ошибка при запуске бота: %s", e, exc_info=True)
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
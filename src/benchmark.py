@@ -0,0 +1,452 @@
+# src/benchmark.py
+#
+# Нагрузочный прогон обработчиков без доступа к Telegram и GitHub:
+#   python -m src.benchmark --manufacturers 200 --models 500 --sessions 2000 --concurrency 64
+# Каталог отдаёт локальный HTTP-сервер, Bot API подменяется фиктивным транспортом.
+# Для CI результат сохраняется (--save) и сравнивается с эталоном (--baseline);
+# при регрессии больше --tolerance или ошибках обработчиков код выхода ненулевой.
+
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import Counter
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional, Tuple
+
+from telegram import Bot, Update
+from telegram.request import BaseRequest, RequestData
+
+from .cache import ResponseCache
+from .catalog_import import download_catalog, write_directory
+from .callbacks import DETAILS, HOME, MANUFACTURERS, MODELS, encode
+from .catalog import catalog_key
+from .config import ConfigManager
+from .handlers import BotHandlers
+from .http_client import HttpClient
+from .http_server import HttpServer, Request, Response
+from .keyboards import render_cache
+from .sources import import_catalog
+from .utils import DataFetcher
+
+try:
+    import resource
+except ImportError:  # не Unix
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+SENSITIVITY_KEYS = ('review', 'collimator', 'x2_scope', 'x4_scope', 'sniper_scope', 'free_review')
+
+
+class StubDataServer:
+    # Синтетический каталог в формате репозитория с настройками; файлы моделей собираются при первом запросе
+    def __init__(self, manufacturers: int = 200, models: int = 500, latency: float = 0.0, host: str = '127.0.0.1', port: int = 0):
+        self.manufacturers = manufacturers
+        self.models = models
+        self.latency = latency
+        self.requests = 0
+        self.not_modified = 0
+        self._bodies: Dict[str, Tuple[bytes, str]] = {}
+
+        self.http_server = HttpServer(host, port)
+        self.http_server.route('GET', '/manufacturers.json', self.handle_file)
+        for slug in self.slugs():
+            self.http_server.route('GET', f'/{slug}.json', self.handle_file)
+
+    def slugs(self) -> List[str]:
+        return [f'brand{i}' for i in range(self.manufacturers)]
+
+    def model_names(self, slug: str) -> List[str]:
+        return [f'{slug.capitalize()} Model {j} (2024)' for j in range(self.models)]
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.http_server.host}:{self.http_server.bound_port}"
+
+    @property
+    def manufacturers_url(self) -> str:
+        return f"{self.base_url}/manufacturers.json"
+
+    @property
+    def base_model_url(self) -> str:
+        return self.base_url + '/{model}.json'
+
+    def _payload(self, path: str) -> Dict[str, Any]:
+        if path == '/manufacturers.json':
+            return {'manufacturers': [
+                {'name': f'Brand {i}', 'model': slug, 'showInProductionApp': True}
+                for i, slug in enumerate(self.slugs())
+            ]}
+
+        slug = path[1:-len('.json')]
+        rng = random.Random(slug)
+        return {'models': [
+            {
+                'name': name,
+                'dpi': rng.randrange(360, 720),
+                'fire_button': rng.randrange(30, 90),
+                'sensitivities': {key: rng.randrange(50, 200) for key in SENSITIVITY_KEYS},
+            }
+            for name in self.model_names(slug)
+        ]}
+
+    def _body(self, path: str) -> Tuple[bytes, str]:
+        cached = self._bodies.get(path)
+        if cached is None:
+            body = json.dumps(self._payload(path), ensure_ascii=False).encode('utf-8')
+            cached = self._bodies[path] = (body, '"%s"' % hashlib.md5(body).hexdigest())
+        return cached
+
+    async def handle_file(self, request: Request) -> Response:
+        self.requests += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        body, etag = self._body(request.path)
+        if request.headers.get('if-none-match') == etag:
+            self.not_modified += 1
+            return Response(304, headers={'ETag': etag})
+        return Response(200, body, 'application/json', {'ETag': etag})
+
+    async def start(self):
+        await self.http_server.start()
+
+    async def stop(self):
+        await self.http_server.stop()
+
+
+class FakeBotRequest(BaseRequest):
+    # Транспорт Bot API без сети: сериализация запросов и разбор ответов PTB остаются настоящими
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.calls: Counter = Counter()
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    def _result(self, endpoint: str, request_data: Optional[RequestData]) -> Any:
+        if endpoint == 'getMe':
+            return {'id': 1, 'is_bot': True, 'first_name': 'Benchmark', 'username': 'benchmark_bot'}
+        if endpoint in ('sendMessage', 'editMessageText'):
+            params = request_data.parameters if request_data is not None else {}
+            chat_id = params.get('chat_id', 0)
+            return {
+                'message_id': params.get('message_id', 1),
+                'date': int(time.time()),
+                'chat': {'id': chat_id, 'type': 'private'},
+                'text': params.get('text', ''),
+            }
+        return True
+
+    async def do_request(self, url: str, method: str, request_data: Optional[RequestData] = None, *args, **kwargs) -> Tuple[int, bytes]:
+        endpoint = url.rsplit('/', 1)[-1]
+        self.calls[endpoint] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return 200, json.dumps({'ok': True, 'result': self._result(endpoint, request_data)}).encode('utf-8')
+
+
+def build_sessions(
+    count: int,
+    slugs: List[str],
+    model_names,
+    manufacturers_per_page: int,
+    models_per_page: int,
+    seed: int = 0,
+) -> List[List[str]]:
+    # Популярность производителей и моделей убывает по закону Ципфа, как у реальной аудитории
+    rng = random.Random(seed)
+    manufacturer_weights = [1 / (rank + 1) for rank in range(len(slugs))]
+    model_weights: Dict[int, List[float]] = {}
+    sessions = []
+    for _ in range(count):
+        index = rng.choices(range(len(slugs)), manufacturer_weights)[0]
+        slug = slugs[index]
+        names = model_names(slug)
+        weights = model_weights.get(len(names))
+        if weights is None:
+            weights = model_weights[len(names)] = [1 / (rank + 1) for rank in range(len(names))]
+        model_index = rng.choices(range(len(names)), weights)[0]
+
+        steps = ['/start', encode(MANUFACTURERS)]
+        if index // manufacturers_per_page:
+            steps.append(encode(MANUFACTURERS, index // manufacturers_per_page))
+        steps.append(encode(MODELS, catalog_key(slug)))
+        if model_index // models_per_page:
+            steps.append(encode(MODELS, catalog_key(slug), model_index // models_per_page))
+        steps.append(encode(DETAILS, catalog_key(slug), catalog_key(names[model_index])))
+        if rng.random() < 0.3:
+            steps.append(encode(HOME))
+        sessions.append(steps)
+    return sessions
+
+
+def _update(update_id: int, chat_id: int, step: str) -> Dict[str, Any]:
+    now = int(time.time())
+    user = {'id': chat_id, 'is_bot': False, 'first_name': 'Load', 'language_code': 'ru'}
+    chat = {'id': chat_id, 'type': 'private', 'first_name': 'Load'}
+    if step.startswith('/'):
+        return {
+            'update_id': update_id,
+            'message': {
+                'message_id': 1, 'date': now, 'chat': chat, 'from': user, 'text': step,
+                'entities': [{'type': 'bot_command', 'offset': 0, 'length': len(step)}],
+            },
+        }
+    return {
+        'update_id': update_id,
+        'callback_query': {
+            'id': str(update_id), 'chat_instance': str(chat_id), 'from': user, 'data': step,
+            'message': {'message_id': 2, 'date': now, 'chat': chat, 'text': 'menu'},
+        },
+    }
+
+
+async def _prepare_source(stub: StubDataServer, http_client: HttpClient, source: str, directory: str) -> Tuple[str, str]:
+    if source == 'http':
+        return stub.manufacturers_url, stub.base_model_url
+
+    # Локальные источники наполняются так же, как командой src.catalog_import
+    manufacturers, models = await download_catalog(DataFetcher(http_client), stub.manufacturers_url, stub.base_model_url)
+    if source == 'sqlite':
+        path = os.path.join(directory, 'catalog.db')
+        await asyncio.to_thread(
+            import_catalog, path, manufacturers['manufacturers'], [(slug, data['models']) for slug, data in models]
+        )
+        return f'sqlite:{path}?manufacturers', f'sqlite:{path}?models={{model}}'
+
+    await asyncio.to_thread(write_directory, directory, manufacturers, models)
+    return f'file:{directory}/manufacturers.json', f'file:{directory}/{{model}}.json'
+
+
+class _ErrorCounter(logging.Handler):
+    # Обработчики перехватывают исключения сами, поэтому ошибки видны только в логе
+    def __init__(self):
+        super().__init__(logging.ERROR)
+        self.count = 0
+
+    def emit(self, record: logging.LogRecord):
+        self.count += 1
+
+
+def _percentiles(samples: List[float]) -> Dict[str, float]:
+    if len(samples) < 2:
+        value = samples[0] * 1000 if samples else 0.0
+        return {'p50': value, 'p95': value, 'p99': value, 'max': value}
+    cuts = statistics.quantiles(samples, n=100, method='inclusive')
+    return {
+        'p50': round(cuts[49] * 1000, 3),
+        'p95': round(cuts[94] * 1000, 3),
+        'p99': round(cuts[98] * 1000, 3),
+        'max': round(max(samples) * 1000, 3),
+    }
+
+
+def _peak_rss_mb() -> Optional[float]:
+    if resource is None:
+        return None
+    # ru_maxrss в Linux измеряется в килобайтах, в macOS — в байтах
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+async def run_benchmark(
+    manufacturers: int = 200,
+    models: int = 500,
+    sessions: int = 1000,
+    concurrency: int = 32,
+    upstream_latency: float = 0.0,
+    api_latency: float = 0.0,
+    cold: bool = False,
+    use_cache: bool = True,
+    trace_memory: bool = False,
+    seed: int = 0,
+    source: str = 'http',
+) -> Dict[str, Any]:
+    stub = StubDataServer(manufacturers, models, latency=upstream_latency)
+    await stub.start()
+    workdir = tempfile.TemporaryDirectory(prefix='benchmark-')
+
+    bot_request = FakeBotRequest(latency=api_latency)
+    bot = Bot('123456:BENCHMARK', request=bot_request, get_updates_request=FakeBotRequest())
+    await bot.initialize()
+
+    http_client = HttpClient(retries=0)
+    await http_client.start()
+
+    error_counter = _ErrorCounter()
+    logging.getLogger().addHandler(error_counter)
+    render_cache.clear()
+
+    data_fetcher = DataFetcher(http_client, ResponseCache() if use_cache else None)
+    try:
+        manufacturers_url, base_model_url = await _prepare_source(stub, http_client, source, workdir.name)
+        config_manager = ConfigManager()
+        handlers = BotHandlers(data_fetcher, config_manager)
+        config_manager.apply({
+            **config_manager.config,
+            'data_sources': {'manufacturers_url': manufacturers_url, 'base_model_url': base_model_url},
+        })
+        manufacturers_per_page = config_manager.settings.pagination.manufacturers_per_page
+        models_per_page = config_manager.settings.pagination.models_per_page
+
+        plan = build_sessions(sessions, stub.slugs(), stub.model_names, manufacturers_per_page, models_per_page, seed)
+
+        if not cold:
+            await data_fetcher.load_catalog(manufacturers_url, base_model_url)
+        upstream_before = stub.requests
+
+        router = handlers.build_router()
+        latencies: Dict[str, List[float]] = {}
+        semaphore = asyncio.Semaphore(concurrency)
+        update_ids = iter(range(1, sys.maxsize))
+
+        async def replay(chat_id: int, steps: List[str]):
+            async with semaphore:
+                context = SimpleNamespace(user_data={}, chat_data={}, bot_data={}, bot=bot)
+                for step in steps:
+                    update = Update.de_json(_update(next(update_ids), chat_id, step), bot)
+                    started = time.perf_counter()
+                    if step == '/start':
+                        handler, context.args = handlers.start, []
+                        await handler(update, context)
+                    else:
+                        handler, _ = router.resolve(step)
+                        await router.dispatch(update, context)
+                    latencies.setdefault(handler.__name__, []).append(time.perf_counter() - started)
+
+        if trace_memory:
+            tracemalloc.start()
+        started = time.perf_counter()
+        await asyncio.gather(*(replay(1000 + i, steps) for i, steps in enumerate(plan)))
+        duration = time.perf_counter() - started
+        traced_peak = tracemalloc.get_traced_memory()[1] if trace_memory else None
+        if trace_memory:
+            tracemalloc.stop()
+    finally:
+        logging.getLogger().removeHandler(error_counter)
+        await data_fetcher.close()
+        await http_client.close()
+        await bot.shutdown()
+        await stub.stop()
+        workdir.cleanup()
+
+    samples = [value for values in latencies.values() for value in values]
+    updates = len(samples)
+    replies = sum(count for endpoint, count in bot_request.calls.items() if endpoint != 'getMe')
+    return {
+        'params': {
+            'manufacturers': manufacturers, 'models': models, 'sessions': sessions,
+            'concurrency': concurrency, 'cold': cold, 'cache': use_cache, 'seed': seed, 'source': source,
+        },
+        'updates': updates,
+        'duration': round(duration, 3),
+        'updates_per_sec': round(updates / duration, 1) if duration else 0.0,
+        'latency_ms': _percentiles(samples),
+        'handlers': {name: {'count': len(values), **_percentiles(values)} for name, values in sorted(latencies.items())},
+        'errors': error_counter.count,
+        'api_calls': dict(bot_request.calls),
+        'missing_replies': max(updates - replies, 0),
+        'upstream_requests': stub.requests - upstream_before,
+        'render_cache': render_cache.stats(),
+        'edits': handlers.editor.stats(),
+        'peak_rss_mb': _peak_rss_mb(),
+        'traced_peak_mb': round(traced_peak / (1024 * 1024), 1) if traced_peak is not None else None,
+    }
+
+
+def compare(result: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    if result['params'] != baseline.get('params'):
+        return [f"параметры прогона не совпадают с эталоном: {baseline.get('params')}"]
+
+    failures = []
+    if result['updates_per_sec'] < baseline['updates_per_sec'] * (1 - tolerance):
+        failures.append(
+            f"пропускная способность упала: {result['updates_per_sec']} < {baseline['updates_per_sec']} upd/s"
+        )
+    for key in ('p95', 'p99'):
+        if result['latency_ms'][key] > baseline['latency_ms'][key] * (1 + tolerance):
+            failures.append(
+                f"{key} вырос: {result['latency_ms'][key]} > {baseline['latency_ms'][key]} мс"
+            )
+    return failures
+
+
+def _print_report(result: Dict[str, Any]):
+    latency = result['latency_ms']
+    print(f"Обновлений: {result['updates']} за {result['duration']} с — {result['updates_per_sec']} upd/s")
+    print(f"Задержка, мс: p50={latency['p50']} p95={latency['p95']} p99={latency['p99']} max={latency['max']}")
+    for name, stats in result['handlers'].items():
+        print(f"  {name}: n={stats['count']} p50={stats['p50']} p95={stats['p95']} p99={stats['p99']}")
+    print(f"Запросов к источнику: {result['upstream_requests']}, вызовов Bot API: {sum(result['api_calls'].values())}")
+    print(f"Правок сообщений: {result['edits']['edits']}, пропущено без изменений: {result['edits']['skipped']}")
+    print(f"Ошибок: {result['errors']}, без ответа: {result['missing_replies']}")
+    print(f"Пиковая память: RSS {result['peak_rss_mb']} МБ" + (
+        f", tracemalloc {result['traced_peak_mb']} МБ" if result['traced_peak_mb'] is not None else ''
+    ))
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Нагрузочный прогон обработчиков на синтетическом каталоге")
+    parser.add_argument('--manufacturers', type=int, default=200, help="Количество производителей")
+    parser.add_argument('--models', type=int, default=500, help="Моделей у каждого производителя")
+    parser.add_argument('--sessions', type=int, default=1000, help="Количество сессий навигации")
+    parser.add_argument('--concurrency', type=int, default=32, help="Одновременных сессий")
+    parser.add_argument('--upstream-latency', type=float, default=0.0, help="Задержка источника данных, мс")
+    parser.add_argument('--api-latency', type=float, default=0.0, help="Задержка Bot API, мс")
+    parser.add_argument('--cold', action='store_true', help="Не прогревать каталог перед замером")
+    parser.add_argument('--no-cache', action='store_true', help="Отключить кэш ответов")
+    parser.add_argument('--source', choices=('http', 'file', 'sqlite'), default='http', help="Источник каталога")
+    parser.add_argument('--tracemalloc', action='store_true', help="Считать пик аллокаций Python (замедляет прогон)")
+    parser.add_argument('--seed', type=int, default=0, help="Зерно генератора сессий")
+    parser.add_argument('--save', help="Сохранить результат в JSON")
+    parser.add_argument('--baseline', help="Эталонный результат для сравнения")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="Допустимая регрессия относительно эталона")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+    result = asyncio.run(run_benchmark(
+        manufacturers=args.manufacturers,
+        models=args.models,
+        sessions=args.sessions,
+        concurrency=args.concurrency,
+        upstream_latency=args.upstream_latency / 1000,
+        api_latency=args.api_latency / 1000,
+        cold=args.cold,
+        use_cache=not args.no_cache,
+        source=args.source,
+        trace_memory=args.tracemalloc,
+        seed=args.seed,
+    ))
+    _print_report(result)
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+
+    failures = []
+    if result['errors'] or result['missing_replies']:
+        failures.append("обработчики завершились с ошибками")
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            failures.extend(compare(result, json.load(f), args.tolerance))
+
+    for failure in failures:
+        print(f"[FAIL] {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,22 +1,249 @@
 # src/bot.py
 
+import asyncio
 import logging
 import os
+from typing import FrozenSet, Optional
 from dotenv import load_dotenv
-from telegram.ext import Application, CommandHandler, CallbackQueryHandler
+from telegram.ext import Application, CommandHandler, CallbackQueryHandler, InlineQueryHandler
+from .cache import ResponseCache
+from .cluster import run_cluster, shared_sources
+from .config import ConfigManager, ConfigWatcher, Settings
 from .handlers import BotHandlers
-from .utils import ConfigManager
+from .http_client import HttpClient
+from .keyboards import render_cache
+from .logging_setup import configure_logging
+from .metrics import InstrumentedRequest, MetricsServer, register_cache_metrics, summary_job
+from .persistence import SqlitePersistence
+from .popularity import PopularityPrefetcher, PopularitySketch
+from .processing import ChatOrderedUpdateProcessor
+from .ratelimit import TelegramRateLimiter
+from .utils import DataFetcher
+from .warmup import CatalogWarmer
+from .webhook import run_webhook
 
 # Загрузка переменных окружения
 load_dotenv()
 
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', 
-    level=logging.INFO
-)
+logger = logging.getLogger(__name__)
+
+def worker_path(path: Optional[str], worker_index: Optional[int]) -> Optional[str]:
+    # У каждого воркера своя доля чатов и свой файл статистики популярности
+    if not path or worker_index is None:
+        return path
+    root, ext = os.path.splitext(path)
+    return f'{root}.worker{worker_index}{ext}'
+
+
+def build_persistence(config_manager: ConfigManager, shared: bool = False) -> Optional[SqlitePersistence]:
+    # На диске хранится только user_data: выбранный пользователем язык. Воркеры кластера
+    # пользуются одной базой, потому что чаты одного пользователя могут попасть в разные воркеры
+    settings = config_manager.get_config('persistence') or {}
+    path = settings.get('path')
+    if not path:
+        return None
+    return SqlitePersistence(path, update_interval=settings.get('update_interval', 60), shared=shared)
+
+
+def build_application(
+    config_manager: ConfigManager,
+    bot_token: str,
+    use_webhook: bool = False,
+    worker_index: Optional[int] = None,
+    catalog_url: Optional[str] = None,
+    secret: Optional[str] = None,
+) -> Application:
+    # worker_index задан — приложение работает воркером кластера (см. cluster.py)
+    worker = worker_index is not None
+
+    # Общий пул HTTP-соединений на всё время жизни приложения
+    http_client = HttpClient.from_config(config_manager)
+    response_cache = ResponseCache.from_config(config_manager)
+    render_cache.max_entries = config_manager.settings.cache.render_max_entries
+    sources = None
+    if worker:
+        # Каталог читается у главного процесса; короткий срок свежести держит воркеры в согласии с ним
+        sources = shared_sources(http_client, catalog_url, secret)
+        if response_cache is not None:
+            response_cache.ttl = config_manager.get_config('workers', 'catalog_ttl') or response_cache.ttl
+    data_fetcher = DataFetcher(
+        http_client,
+        response_cache,
+        max_waiters=config_manager.get_config('http', 'max_waiters_per_url') or 1000,
+        sources=sources
+    )
+    popularity = PopularitySketch.from_config(config_manager)
+    handlers = BotHandlers(data_fetcher, config_manager, popularity)
+    # Прогрев и снимок каталога ведёт только главный процесс: воркер загружает у него файлы
+    # по первому обращению, и память воркера растёт с его долей запросов, а не с размером каталога
+    warmer = None if worker else CatalogWarmer.from_config(config_manager, data_fetcher)
+    popularity_path = config_manager.get_config('popularity', 'snapshot_path') if popularity is not None else None
+    popularity_path = worker_path(popularity_path, worker_index)
+    prefetcher = PopularityPrefetcher.from_config(
+        config_manager, popularity, data_fetcher, handlers.locales, snapshot_path=popularity_path
+    )
+    watcher = ConfigWatcher(config_manager, handlers.locales)
+
+    def apply_settings(old: Settings, new: Settings, changed: FrozenSet[str]):
+        # Сбрасывается только то, что зависит от изменившихся секций
+        if 'data_sources' in changed:
+            data_fetcher.forget(old.data_sources.retired(new.data_sources))
+            if warmer is not None:
+                warmer.configure(new)
+                application.create_task(warmer.warm_up())
+        if 'pagination' in changed:
+            render_cache.discard(lambda key: key[0] in ('manufacturers', 'models'))
+        if 'cache' in changed:
+            render_cache.max_entries = new.cache.render_max_entries
+            if response_cache is not None:
+                ttl = response_cache.ttl
+                response_cache.configure(new.cache)
+                if worker:
+                    # Срок свежести воркера задаёт workers.catalog_ttl
+                    response_cache.ttl = ttl
+        if 'reload' in changed:
+            run_every(watcher.watch_job, new.reload_interval, 'config_reload')
+        if 'warmup' in changed and warmer is not None:
+            warmer.configure(new)
+            run_every(warmer.refresh_job, new.warmup.refresh_interval, 'catalog_refresh')
+
+    def run_every(callback, interval: Optional[float], name: str):
+        # Задача с тем же именем заменяется; нулевой интервал её отключает
+        for job in application.job_queue.get_jobs_by_name(name):
+            job.schedule_removal()
+        if interval:
+            application.job_queue.run_repeating(callback, interval=interval, first=interval, name=name)
+
+    config_manager.subscribe(apply_settings)
+
+    metrics_settings = config_manager.get_config('metrics') or {}
+    caches = {'response': response_cache, 'render': render_cache}
+    register_cache_metrics(caches)
+    metrics_server = None
+    if metrics_settings.get('enabled', False):
+        metrics_port = metrics_settings.get('port', 9100)
+        metrics_server = MetricsServer(
+            host=metrics_settings.get('listen', '127.0.0.1'),
+            # Воркер i слушает порт port + 1 + i
+            port=metrics_port + 1 + worker_index if worker else metrics_port,
+            path=metrics_settings.get('path', '/metrics'),
+        )
+
+    async def post_init(application: Application):
+        await http_client.start()
+        if metrics_server is not None:
+            await metrics_server.start()
+
+        summary_interval = metrics_settings.get('summary_interval')
+        if summary_interval:
+            application.job_queue.run_repeating(
+                summary_job(caches),
+                interval=summary_interval,
+                first=summary_interval,
+                name='metrics_summary'
+            )
+
+        run_every(watcher.watch_job, config_manager.settings.reload_interval, 'config_reload')
+
+        if warmer is not None:
+            # Со снимком с диска бот отвечает сразу, а свежие данные догружаются в фоне
+            if warmer.load_snapshot():
+                application.create_task(warmer.warm_up())
+            else:
+                await warmer.warm_up()
+
+            run_every(warmer.refresh_job, config_manager.settings.warmup.refresh_interval, 'catalog_refresh')
+
+        if prefetcher is not None:
+            prefetcher.load_snapshot()
+            prefetch_interval = config_manager.get_config('popularity', 'interval') or 30
+            application.job_queue.run_repeating(
+                prefetcher.prefetch_job,
+                interval=prefetch_interval,
+                first=prefetch_interval,
+                name='popularity_prefetch'
+            )
+
+    async def post_shutdown(application: Application):
+        await data_fetcher.close()
+        await http_client.close()
+        if metrics_server is not None:
+            await metrics_server.stop()
+        if response_cache is not None:
+            logger.info("Статистика кэша: %s", response_cache.stats())
+        logger.info("Статистика кэша отрисовки: %s", render_cache.stats())
+        logger.info("Статистика объединения загрузок: %s", data_fetcher.flights.stats())
+        logger.info("Статистика редактирования сообщений: %s", handlers.editor.stats())
+        if prefetcher is not None:
+            await prefetcher.save_snapshot()
+            logger.info("Статистика популярности: %s", prefetcher.stats())
+
+    max_concurrent_updates = config_manager.get_config('concurrency', 'max_concurrent_updates') or 1
+    rate_limiter = TelegramRateLimiter.from_config(
+        config_manager, shares=(config_manager.get_config('workers', 'count') or 1) if worker else 1
+    )
+
+    builder = (
+        Application.builder()
+        .token(bot_token)
+        .request(InstrumentedRequest(connection_pool_size=256))
+        .post_init(post_init)
+        .post_shutdown(post_shutdown)
+        .concurrent_updates(ChatOrderedUpdateProcessor(max_concurrent_updates))
+    )
+    api_base_url = (config_manager.get_config('bot') or {}).get('api_base_url')
+    if api_base_url:
+        builder = builder.base_url(api_base_url)
+    if rate_limiter is not None:
+        builder = builder.rate_limiter(rate_limiter)
+    persistence = build_persistence(config_manager, shared=worker)
+    if persistence is not None:
+        builder = builder.persistence(persistence)
+    if use_webhook:
+        # Обновления приходят во встроенный HTTP-сервер, Updater не нужен
+        builder = builder.updater(None)
+    application = builder.build()
+
+    # Регистрация команд
+    application.add_handler(CommandHandler('start', handlers.start))
+    application.add_handler(CommandHandler('language', handlers.handle_language))
+    application.add_handler(CommandHandler('search', handlers.handle_search))
+
+    # Inline-режим (нужно включить через @BotFather командой /setinline)
+    application.add_handler(InlineQueryHandler(handlers.handle_inline_query))
+    
+    # Все кнопки обрабатываются одним маршрутизатором (формат данных — в callbacks.py)
+    application.add_handler(CallbackQueryHandler(handlers.build_router().dispatch))
+    return application
+
+
+def run_worker(index: int, catalog_url: str, port: int, secret: str):
+    # Точка входа процесса-воркера: собственный лог-файл и вебхук только для главного процесса
+    config_manager = ConfigManager.shared()
+    logging_settings = dict(config_manager.get_config('logging') or {})
+    log_file = logging_settings.get('file', 'logs/bot.log')
+    if log_file:
+        root, ext = os.path.splitext(log_file)
+        logging_settings['file'] = f'{root}.worker{index}{ext}'
+    configure_logging(logging_settings)
+
+    application = build_application(
+        config_manager,
+        os.getenv('TELEGRAM_BOT_TOKEN'),
+        use_webhook=True,
+        worker_index=index,
+        catalog_url=catalog_url,
+        secret=secret
+    )
+    settings = {'listen': '127.0.0.1', 'port': port, 'path': '/update', 'health_path': '/health'}
+    asyncio.run(run_webhook(application, settings, secret_token=secret, register=False))
+
 
 def main():
-    config_manager = ConfigManager()
+    config_manager = ConfigManager.shared()
+    # При запуске через main.py логирование уже настроено; при python -m src.bot — ещё нет
+    if not logging.getLogger().handlers:
+        configure_logging(config_manager.get_config('logging'))
     
     # Получаем токен из переменных окружения
     bot_token = os.getenv('TELEGRAM_BOT_TOKEN')
@@ -25,21 +252,19 @@ def main():
         print("Please set your Telegram Bot token in .env file")
         return
 
-    handlers = BotHandlers()
-    
-    application = Application.builder().token(bot_token).build()
-
-    # Регистрация команд
-    application.add_handler(CommandHandler('start', handlers.start))
-    
-    # Регистрация обработчиков callback-запросов
-    application.add_handler(CallbackQueryHandler(handlers.start, pattern=r'^home$'))
-    application.add_handler(CallbackQueryHandler(handlers.handle_manufacturers, pattern=r'^manufacturers$|^manufacturers_page:\d+$'))
-    application.add_handler(CallbackQueryHandler(handlers.handle_models, pattern=r'^manufacturer:\w+$|^models_page:\w+:\d+$'))
-    application.add_handler(CallbackQueryHandler(handlers.show_model_details, pattern=r'^model:\w+:\w+$'))
+    webhook_settings = config_manager.get_config('webhook') or {}
+    use_webhook = webhook_settings.get('enabled', False)
+    workers = config_manager.get_config('workers', 'count') or 1
 
     # Запуск бота
-    application.run_polling(drop_pending_updates=True)
+    if use_webhook and workers > 1:
+        asyncio.run(run_cluster(config_manager, bot_token, webhook_settings, run_worker))
+    elif use_webhook:
+        application = build_application(config_manager, bot_token, use_webhook=True)
+        asyncio.run(run_webhook(application, webhook_settings))
+    else:
+        application = build_application(config_manager, bot_token)
+        application.run_polling(drop_pending_updates=True)
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -0,0 +1,230 @@
+# src/cache.py
+
+import time
+import logging
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Set
+
+# Настройка логгера
+logger = logging.getLogger(__name__)
+
+
+class CacheEntry:
+    __slots__ = ('data', 'etag', 'last_modified', 'fetched_at')
+
+    def __init__(self, data: Any, etag: Optional[str] = None, last_modified: Optional[str] = None):
+        self.data = data
+        self.etag = etag
+        self.last_modified = last_modified
+        self.fetched_at = time.monotonic()
+
+    def age(self) -> float:
+        return time.monotonic() - self.fetched_at
+
+    def touch(self):
+        self.fetched_at = time.monotonic()
+
+
+class ResponseCache:
+    def __init__(
+        self,
+        ttl: float = 300,
+        stale_while_revalidate: float = 600,
+        max_entries: int = 256,
+        failure_backoff: float = 30,
+    ):
+        self.ttl = ttl
+        self.stale_while_revalidate = stale_while_revalidate
+        self.max_entries = max_entries
+        # Сколько секунд после неудачной загрузки не обращаться к источнику за тем же URL
+        self.failure_backoff = failure_backoff
+        self._failures: Dict[str, float] = {}
+        # Популярные URL (см. popularity.py) вытесняются только если кроме них вытеснять нечего
+        self.retained: Set[str] = set()
+
+        self._entries: 'OrderedDict[str, CacheEntry]' = OrderedDict()
+        self.hits = 0
+        self.stale_hits = 0
+        self.expired_hits = 0
+        self.misses = 0
+        self.failures = 0
+        self.revalidations = 0
+        self.not_modified = 0
+        self.evictions = 0
+
+    @classmethod
+    def from_config(cls, config_manager) -> Optional['ResponseCache']:
+        settings = config_manager.settings.cache
+        if not settings.enabled:
+            logger.info("Кэш ответов отключён в конфигурации")
+            return None
+        return cls(
+            ttl=settings.ttl,
+            stale_while_revalidate=settings.stale_while_revalidate,
+            max_entries=settings.max_entries,
+            failure_backoff=settings.failure_backoff,
+        )
+
+    def configure(self, settings):
+        # Новые значения секции cache (CacheSettings) без перезапуска; лишние записи вытесняются при следующем put
+        self.ttl = settings.ttl
+        self.stale_while_revalidate = settings.stale_while_revalidate
+        self.max_entries = settings.max_entries
+        self.failure_backoff = settings.failure_backoff
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, url: str) -> bool:
+        return url in self._entries
+
+    def get(self, url: str) -> Optional[CacheEntry]:
+        entry = self._entries.get(url)
+        if entry is not None:
+            self._entries.move_to_end(url)
+        return entry
+
+    def peek(self, url: str) -> Optional[CacheEntry]:
+        # Без продления записи в LRU: для фоновых проверок, а не для ответов пользователям
+        return self._entries.get(url)
+
+    def is_fresh(self, entry: CacheEntry) -> bool:
+        return entry.age() < self.ttl
+
+    def is_usable_stale(self, entry: CacheEntry) -> bool:
+        return entry.age() < self.ttl + self.stale_while_revalidate
+
+    def mark_failed(self, url: str):
+        self.failures += 1
+        self._failures[url] = time.monotonic() + self.failure_backoff
+
+    def backing_off(self, url: str) -> bool:
+        retry_at = self._failures.get(url)
+        if retry_at is None:
+            return False
+        if time.monotonic() < retry_at:
+            return True
+        del self._failures[url]
+        return False
+
+    def put(self, url: str, data: Any, etag: Optional[str] = None, last_modified: Optional[str] = None) -> CacheEntry:
+        self._failures.pop(url, None)
+        entry = CacheEntry(data, etag, last_modified)
+        self._entries[url] = entry
+        self._entries.move_to_end(url)
+
+        # Вытесняем давно не использованные записи, начиная с непопулярных
+        while len(self._entries) > self.max_entries:
+            evicted_url = next((candidate for candidate in self._entries if candidate not in self.retained), None)
+            if evicted_url is None or evicted_url == url:
+                evicted_url = next(iter(self._entries))
+            del self._entries[evicted_url]
+            self.evictions += 1
+            logger.debug("Запись вытеснена из кэша: %s", evicted_url)
+
+        return entry
+
+    def restore(self, url: str, data: Any, etag: Optional[str] = None, last_modified: Optional[str] = None):
+        # Восстановленные с диска данные сразу считаются устаревшими:
+        # они отдаются пользователям, но при первом обращении обновляются в фоне
+        if url in self._entries:
+            return
+        entry = self.put(url, data, etag, last_modified)
+        entry.fetched_at -= self.ttl
+
+    def export(self) -> Dict[str, list]:
+        return {
+            url: [entry.data, entry.etag, entry.last_modified]
+            for url, entry in self._entries.items()
+        }
+
+    def invalidate(self, url: Optional[str] = None):
+        if url is None:
+            self._entries.clear()
+            self._failures.clear()
+        else:
+            self._entries.pop(url, None)
+            self._failures.pop(url, None)
+
+    def discard(self, predicate: Callable[[str], bool]) -> int:
+        for url in [url for url in self._failures if predicate(url)]:
+            del self._failures[url]
+        urls = [url for url in self._entries if predicate(url)]
+        for url in urls:
+            del self._entries[url]
+        return len(urls)
+
+    def stats(self) -> Dict[str, Any]:
+        served = self.hits + self.stale_hits + self.expired_hits
+        lookups = served + self.misses
+        return {
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'stale_hits': self.stale_hits,
+            'expired_hits': self.expired_hits,
+            'misses': self.misses,
+            'failures': self.failures,
+            'revalidations': self.revalidations,
+            'not_modified': self.not_modified,
+            'evictions': self.evictions,
+            'hit_ratio': served / lookups if lookups else 0.0,
+        }
+
+
+class LRUCache:
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[Any, Any]' = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Any) -> Any:
+        value = self._entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return value
+
+    def peek(self, key: Any) -> Any:
+        # Без учёта в статистике попаданий и без продления записи в LRU
+        return self._entries.get(key)
+
+    def put(self, key: Any, value: Any):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def get_or_build(self, key: Any, build) -> Any:
+        value = self.get(key)
+        if value is None:
+            value = build()
+            if value is not None:
+                self.put(key, value)
+        return value
+
+    def clear(self):
+        self._entries.clear()
+
+    def discard(self, predicate: Callable[[Any], bool]) -> int:
+        keys = [key for key in self._entries if predicate(key)]
+        for key in keys:
+            del self._entries[key]
+        return len(keys)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_ratio': self.hits / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,120 @@
+# src/callbacks.py
+#
+# Формат callback_data версии 1: "<версия><действие>[:<аргумент>...]", например
+#   "1h"                — главное меню
+#   "1M:3"              — страница 3 списка производителей
+#   "1m:<key>:2"        — страница 2 моделей производителя
+#   "1d:<key>:<key>"    — карточка модели
+#   "1l:en"             — выбор языка
+# Производители и модели передаются короткими ключами catalog_key (8 символов), поэтому
+# данные кнопки укладываются в лимит Telegram в 64 байта при любых названиях.
+# Кнопки старого формата ("manufacturer:xiaomi", "model:xiaomi:Redmi 9", ...) из уже
+# отправленных сообщений по-прежнему распознаются.
+
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from telegram import CallbackQuery, Update
+from telegram.error import TelegramError
+from telegram.ext import ContextTypes
+
+from .catalog import catalog_key
+
+# Настройка логгера
+logger = logging.getLogger(__name__)
+
+CALLBACK_VERSION = '1'
+MAX_CALLBACK_DATA = 64
+
+HOME = 'h'
+MANUFACTURERS = 'M'
+MODELS = 'm'
+DETAILS = 'd'
+LANGUAGE = 'l'
+
+Handler = Callable[[Update, ContextTypes.DEFAULT_TYPE], Awaitable[None]]
+
+
+@dataclass(frozen=True, slots=True)
+class Callback:
+    action: str
+    args: Tuple[str, ...] = ()
+
+
+def encode(action: str, *args) -> str:
+    data = ':'.join((CALLBACK_VERSION + action, *map(str, args)))
+    if len(data.encode('utf-8')) > MAX_CALLBACK_DATA:
+        raise ValueError(f"callback_data длиннее {MAX_CALLBACK_DATA} байт: {data}")
+    return data
+
+
+def decode(data: Optional[str]) -> Optional[Callback]:
+    if not data:
+        return None
+    if data[0] == CALLBACK_VERSION and len(data) > 1:
+        fields = data[1:].split(':')
+        return Callback(fields[0], tuple(fields[1:]))
+    return _decode_legacy(data)
+
+
+def _decode_legacy(data: str) -> Optional[Callback]:
+    # Имена из старых кнопок переводятся в ключи, чтобы обработчики работали с одним форматом
+    action, _, rest = data.partition(':')
+    if action == 'home':
+        return Callback(HOME)
+    if action == 'manufacturers':
+        return Callback(MANUFACTURERS)
+    if action == 'manufacturers_page':
+        return Callback(MANUFACTURERS, (rest,))
+    if action == 'manufacturer' and rest:
+        return Callback(MODELS, (catalog_key(rest),))
+    if action == 'models_page':
+        manufacturer, _, page = rest.rpartition(':')
+        return Callback(MODELS, (catalog_key(manufacturer), page))
+    if action == 'model' and rest:
+        manufacturer, _, model = rest.partition(':')
+        return Callback(DETAILS, (catalog_key(manufacturer), catalog_key(model)))
+    if action == 'language':
+        return Callback(LANGUAGE, (rest,) if rest else ())
+    return None
+
+
+class CallbackRouter:
+    # Один CallbackQueryHandler на все кнопки: действие выбирается по словарю, без перебора регулярных выражений
+    def __init__(self):
+        self._routes: Dict[str, Handler] = {}
+
+    def route(self, action: str, handler: Handler):
+        self._routes[action] = handler
+
+    def resolve(self, data: Optional[str]) -> Tuple[Optional[Handler], Tuple[str, ...]]:
+        callback = decode(data)
+        if callback is None:
+            return None, ()
+        return self._routes.get(callback.action), callback.args
+
+    async def dispatch(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        handler, args = self.resolve(update.callback_query.data)
+        if handler is None:
+            logger.warning("Неизвестные данные кнопки: %s", update.callback_query.data)
+            await self._answer(update.callback_query)
+            return
+
+        # Отвечаем на нажатие сразу и параллельно с отрисовкой, чтобы клиент не показывал индикатор загрузки
+        answer = asyncio.create_task(self._answer(update.callback_query))
+        # Аргументы передаются так же, как у команд, — через context.args
+        context.args = list(args)
+        try:
+            await handler(update, context)
+        finally:
+            await answer
+
+    @staticmethod
+    async def _answer(query: CallbackQuery):
+        try:
+            await query.answer()
+        except TelegramError as e:
+            # Например, запрос старше 15 минут; на отрисовку это не влияет
+            logger.debug("Не удалось ответить на callback-запрос %s: %s", query.id, e)
@@ -0,0 +1,187 @@
+# src/catalog.py
+
+import base64
+import functools
+import hashlib
+import itertools
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Dict, Generic, Iterator, List, Optional, Tuple, TypeVar
+
+# Настройка логгера
+logger = logging.getLogger(__name__)
+
+# Глобальный счётчик версий: каждая пересборка индекса получает новый номер
+_versions = itertools.count(1)
+
+T = TypeVar('T')
+
+
+@functools.lru_cache(maxsize=65536)
+def catalog_key(name: str) -> str:
+    # Короткий стабильный идентификатор для callback_data: не зависит от порядка записей
+    # в каталоге, переживает перезапуск и не содержит символов, которые нужно экранировать
+    digest = hashlib.blake2b(name.encode('utf-8'), digest_size=6).digest()
+    return base64.urlsafe_b64encode(digest).decode('ascii')
+
+
+@dataclass(frozen=True, slots=True)
+class Sensitivities:
+    values: Tuple[Tuple[str, Any], ...] = ()
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict]) -> 'Sensitivities':
+        return cls(tuple((data or {}).items()))
+
+    def items(self) -> Tuple[Tuple[str, Any], ...]:
+        return self.values
+
+    def get(self, key: str, default: Any = None) -> Any:
+        for name, value in self.values:
+            if name == key:
+                return value
+        return default
+
+
+@dataclass(frozen=True, slots=True)
+class DeviceModel:
+    name: str
+    manufacturer: str
+    dpi: Any = None
+    fire_button: Any = None
+    sensitivities: Sensitivities = Sensitivities()
+    key: str = ''
+
+    @classmethod
+    def from_dict(cls, data: Dict, manufacturer: str) -> 'DeviceModel':
+        return cls(
+            name=data['name'],
+            manufacturer=manufacturer,
+            dpi=data.get('dpi'),
+            fire_button=data.get('fire_button'),
+            sensitivities=Sensitivities.from_dict(data.get('sensitivities')),
+            key=catalog_key(data['name']),
+        )
+
+
+@dataclass(frozen=True, slots=True)
+class Manufacturer:
+    name: str
+    slug: str
+    show_in_production: bool = False
+    key: str = ''
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'Manufacturer':
+        return cls(
+            name=data.get('name', data['model']),
+            slug=data['model'],
+            show_in_production=bool(data.get('showInProductionApp', False)),
+            key=catalog_key(data['model']),
+        )
+
+
+@dataclass(frozen=True, slots=True)
+class Page(Generic[T]):
+    items: Tuple[T, ...]
+    number: int
+    has_prev: bool
+    has_next: bool
+
+
+@dataclass(slots=True)
+class PagedIndex(Generic[T]):
+    items: Tuple[T, ...]
+    version: int = field(default_factory=lambda: next(_versions))
+    _pages: Dict[int, Tuple[Page, ...]] = field(default_factory=dict, repr=False)
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def __iter__(self) -> Iterator[T]:
+        return iter(self.items)
+
+    def pages(self, per_page: int) -> Tuple[Page, ...]:
+        # Границы страниц считаются один раз для каждого размера страницы
+        pages = self._pages.get(per_page)
+        if pages is None:
+            total = len(self.items)
+            starts = range(0, total, per_page) if total else (0,)
+            pages = tuple(
+                Page(self.items[start:start + per_page], number, number > 0, start + per_page < total)
+                for number, start in enumerate(starts)
+            )
+            self._pages[per_page] = pages
+        return pages
+
+    def page(self, number: int, per_page: int) -> Page:
+        pages = self.pages(per_page)
+        if 0 <= number < len(pages):
+            return pages[number]
+        return Page((), number, number > 0, False)
+
+
+@dataclass(slots=True)
+class ManufacturerIndex(PagedIndex[Manufacturer]):
+    by_slug: Dict[str, Manufacturer] = field(default_factory=dict)
+    by_key: Dict[str, Manufacturer] = field(default_factory=dict)
+
+    @classmethod
+    def from_raw(cls, raw: List[Dict]) -> 'ManufacturerIndex':
+        manufacturers = tuple(
+            Manufacturer.from_dict(m) for m in raw
+            if m.get('showInProductionApp', False) and 'model' in m
+        )
+        return cls(
+            manufacturers,
+            by_slug={m.slug: m for m in manufacturers},
+            by_key=_index_by_key(manufacturers, 'производителей'),
+        )
+
+    def get(self, slug: str) -> Optional[Manufacturer]:
+        return self.by_slug.get(slug)
+
+    def get_by_key(self, key: str) -> Optional[Manufacturer]:
+        return self.by_key.get(key)
+
+
+@dataclass(slots=True)
+class ModelIndex(PagedIndex[DeviceModel]):
+    manufacturer: str = ''
+    by_name: Dict[str, DeviceModel] = field(default_factory=dict)
+    by_key: Dict[str, DeviceModel] = field(default_factory=dict)
+
+    @classmethod
+    def from_raw(cls, raw: List[Dict], manufacturer: str) -> 'ModelIndex':
+        models = []
+        for m in raw:
+            if 'name' not in m:
+                logger.warning("Модель без имени пропущена у производителя %s", manufacturer)
+                continue
+            models.append(DeviceModel.from_dict(m, manufacturer))
+        models = tuple(models)
+        by_name = {}
+        for m in models:
+            # Как и в by_key, при повторе названия остаётся первая запись
+            by_name.setdefault(m.name, m)
+        return cls(
+            models,
+            manufacturer=manufacturer,
+            by_name=by_name,
+            by_key=_index_by_key(models, f'моделей {manufacturer}'),
+        )
+
+    def get(self, name: str) -> Optional[DeviceModel]:
+        return self.by_name.get(name)
+
+    def get_by_key(self, key: str) -> Optional[DeviceModel]:
+        return self.by_key.get(key)
+
+
+def _index_by_key(items, what: str) -> Dict[str, Any]:
+    by_key = {}
+    for item in items:
+        # При совпадении ключей кнопка ведёт на первую запись; на практике 48 бит хватает с запасом
+        if by_key.setdefault(item.key, item) is not item:
+            logger.warning("Совпадение ключей %s: %s и %s", what, by_key[item.key].name, item.name)
+    return by_key
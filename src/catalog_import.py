@@ -0,0 +1,113 @@
+# src/catalog_import.py
+#
+# Полная выгрузка базы FFSensitivities в локальное хранилище:
+#   python -m src.catalog_import --db data/catalog.db
+#   python -m src.catalog_import --dir data/FFSensitivities
+# Источник по умолчанию — data_sources из config/config.yaml. После импорта в конфигурации
+# можно указать sqlite:data/catalog.db?manufacturers и sqlite:data/catalog.db?models={model}
+# (или file:data/FFSensitivities/manufacturers.json и file:data/FFSensitivities/{model}.json).
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+from typing import Dict, List, Optional, Tuple
+
+from .http_client import HttpClient
+from .config import ConfigManager
+from .sources import import_catalog
+from .utils import DataFetcher
+
+logger = logging.getLogger(__name__)
+
+
+async def download_catalog(
+    data_fetcher: DataFetcher,
+    manufacturers_url: str,
+    base_model_url: str,
+    concurrency: int = 8,
+) -> Tuple[Optional[Dict], List[Tuple[str, Dict]]]:
+    # Выгружаются все производители, включая скрытые в приложении: фильтрация остаётся на стороне бота
+    manufacturers = await data_fetcher.fetch_json(manufacturers_url)
+    if not manufacturers or 'manufacturers' not in manufacturers:
+        return None, []
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def load(slug: str) -> Optional[Tuple[str, Dict]]:
+        async with semaphore:
+            data = await data_fetcher.fetch_json(base_model_url.format(model=slug))
+        if not data or 'models' not in data:
+            logger.warning("Файл моделей %s пропущен", slug)
+            return None
+        return slug, data
+
+    slugs = [m['model'] for m in manufacturers['manufacturers'] if 'model' in m]
+    results = await asyncio.gather(*(load(slug) for slug in slugs))
+    return manufacturers, [result for result in results if result is not None]
+
+
+def write_directory(path: str, manufacturers: Dict, models: List[Tuple[str, Dict]]):
+    os.makedirs(path, exist_ok=True)
+    files = [('manufacturers', manufacturers), *models]
+    for name, data in files:
+        target = os.path.join(path, f'{name}.json')
+        tmp_path = f'{target}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, target)
+
+
+async def run_import(args: argparse.Namespace) -> int:
+    config_manager = ConfigManager(args.config)
+    manufacturers_url = args.manufacturers_url or config_manager.get_config('data_sources', 'manufacturers_url')
+    base_model_url = args.base_model_url or config_manager.get_config('data_sources', 'base_model_url')
+
+    http_client = HttpClient.from_config(config_manager)
+    data_fetcher = DataFetcher(http_client)
+    try:
+        manufacturers, models = await download_catalog(data_fetcher, manufacturers_url, base_model_url, args.concurrency)
+    finally:
+        await data_fetcher.close()
+        await http_client.close()
+
+    if manufacturers is None:
+        print(f"Не удалось загрузить список производителей: {manufacturers_url}")
+        return 1
+
+    total = len(manufacturers['manufacturers'])
+    if args.db:
+        count = await asyncio.to_thread(
+            import_catalog,
+            args.db,
+            manufacturers['manufacturers'],
+            [(slug, data['models']) for slug, data in models]
+        )
+        print(f"{args.db}: производителей {total}, файлов моделей {len(models)}, моделей {count}")
+    if args.dir:
+        await asyncio.to_thread(write_directory, args.dir, manufacturers, models)
+        print(f"{args.dir}: производителей {total}, файлов моделей {len(models)}")
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Импорт каталога чувствительностей в локальное хранилище")
+    parser.add_argument('--db', help="Путь к базе SQLite")
+    parser.add_argument('--dir', help="Каталог для JSON-файлов")
+    parser.add_argument('--config', default='config/config.yaml', help="Файл конфигурации")
+    parser.add_argument('--manufacturers-url', help="URL списка производителей (по умолчанию из конфигурации)")
+    parser.add_argument('--base-model-url', help="Шаблон URL файлов моделей с {model}")
+    parser.add_argument('--concurrency', type=int, default=8, help="Одновременных загрузок")
+    args = parser.parse_args(argv)
+
+    if not args.db and not args.dir:
+        parser.error("укажите --db и/или --dir")
+
+    logging.basicConfig(level=logging.WARNING)
+    return asyncio.run(run_import(args))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,384 @@
+# src/cluster.py
+#
+# Режим нескольких процессов (workers.count > 1 при включённом вебхуке):
+#   главный процесс  — принимает вебхук Telegram, раскладывает обновления по воркерам
+#                      по chat_id и держит единственную копию каталога (кэш, single-flight,
+#                      прогрев и снимок на диске) за локальным эндпоинтом /catalog;
+#   воркеры          — обычные экземпляры бота без set_webhook; файлы каталога читают
+#                      у главного процесса условными запросами (ETag), а не из источника.
+# Обновления одного чата всегда попадают в один воркер, поэтому порядок их обработки
+# и состояние сообщений (MessageEditor) остаются такими же, как в одном процессе. user_data
+# принадлежит пользователю, а не чату, и хранится в общей базе (см. persistence.py).
+
+import asyncio
+import hashlib
+import hmac
+import json
+import logging
+import multiprocessing
+import os
+import secrets
+from typing import Any, Callable, Dict, FrozenSet, List, Optional, Tuple
+from urllib.parse import parse_qs, quote
+
+import httpx
+from telegram import Bot, Update
+
+from .cache import ResponseCache
+from .config import ConfigWatcher, Settings
+from .http_client import HttpClient
+from .http_server import HttpServer, Request, Response
+from .sources import DataSource, HttpSource
+from .utils import DataFetcher
+from .warmup import CatalogWarmer
+from .webhook import SECRET_HEADER as WEBHOOK_SECRET_HEADER, WebhookServer, stop_event
+
+# Настройка логгера
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = 'x-cluster-secret'
+
+# Поля обновления, по которым определяется чат; порядок важен только для callback_query
+_CHAT_FIELDS = (
+    'message', 'edited_message', 'channel_post', 'edited_channel_post', 'callback_query',
+    'inline_query', 'chosen_inline_result', 'shipping_query', 'pre_checkout_query',
+    'poll_answer', 'my_chat_member', 'chat_member', 'chat_join_request',
+)
+
+
+def shard_key(data: Dict[str, Any]) -> int:
+    # Для кнопок берётся чат сообщения, для inline-запросов и ответов без чата — пользователь
+    for name in _CHAT_FIELDS:
+        payload = data.get(name)
+        if not isinstance(payload, dict):
+            continue
+        for source in (payload.get('chat'), (payload.get('message') or {}).get('chat'), payload.get('from'), payload.get('user')):
+            if isinstance(source, dict) and isinstance(source.get('id'), int):
+                return source['id']
+    return 0
+
+
+def _check_secret(request: Request, secret: Optional[str]) -> bool:
+    if not secret:
+        return True
+    received = request.headers.get(SECRET_HEADER, '')
+    return hmac.compare_digest(received.encode('utf-8'), secret.encode('utf-8'))
+
+
+class CatalogServer:
+    # Отдаёт воркерам файлы каталога из кэша главного процесса: сколько бы ни было воркеров,
+    # источник опрашивается один раз на URL
+    def __init__(self, data_fetcher: DataFetcher, host: str = '127.0.0.1', port: int = 8089, secret: Optional[str] = None):
+        self.data_fetcher = data_fetcher
+        self.secret = secret
+        self.requests = 0
+        self.not_modified = 0
+        # url -> (данные, тело ответа, ETag): сериализация повторяется, только когда данные сменились
+        self._bodies: Dict[str, Tuple[Any, bytes, str]] = {}
+
+        self.http_server = HttpServer(host, port)
+        self.http_server.route('GET', '/catalog', self.handle_catalog)
+
+    @property
+    def url(self) -> str:
+        return f'http://{self.http_server.host}:{self.http_server.bound_port}/catalog'
+
+    async def start(self):
+        await self.http_server.start()
+
+    async def stop(self):
+        await self.http_server.stop()
+
+    async def handle_catalog(self, request: Request) -> Response:
+        if not _check_secret(request, self.secret):
+            return Response.text('Forbidden', 403)
+
+        url = (parse_qs(request.query).get('url') or [''])[0]
+        if not url:
+            return Response.text('Bad Request', 400)
+
+        self.requests += 1
+        data = await self.data_fetcher.fetch_json(url)
+        if data is None:
+            return Response.text('Bad Gateway', 502)
+
+        cached = self._bodies.get(url)
+        if cached is None or cached[0] is not data:
+            body = json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+            cached = self._bodies[url] = (data, body, f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"')
+        _, body, etag = cached
+
+        if request.headers.get('if-none-match') == etag:
+            self.not_modified += 1
+            return Response(304, headers={'ETag': etag})
+        return Response(200, body, 'application/json', {'ETag': etag})
+
+    def stats(self) -> Dict[str, Any]:
+        return {'urls': len(self._bodies), 'requests': self.requests, 'not_modified': self.not_modified}
+
+
+class SharedSource(HttpSource):
+    # Источник воркера: любой URL каталога запрашивается у CatalogServer главного процесса
+    def __init__(self, http_client: HttpClient, catalog_url: str, secret: Optional[str] = None):
+        super().__init__(http_client, {SECRET_HEADER: secret} if secret else None)
+        self.catalog_url = catalog_url
+
+    def request_url(self, url: str) -> str:
+        return f'{self.catalog_url}?url={quote(url, safe="")}'
+
+
+def shared_sources(http_client: HttpClient, catalog_url: str, secret: Optional[str] = None) -> Dict[str, DataSource]:
+    shared = SharedSource(http_client, catalog_url, secret)
+    return {'http': shared, 'https': shared, 'file': shared, 'sqlite': shared}
+
+
+class WorkerPool:
+    # Процессы запускаются через spawn: воркер не наследует цикл событий и сокеты главного процесса
+    def __init__(
+        self,
+        target: Callable[..., None],
+        count: int,
+        catalog_url: str,
+        host: str = '127.0.0.1',
+        base_port: int = 8090,
+        secret: Optional[str] = None,
+    ):
+        self.target = target
+        self.count = count
+        self.catalog_url = catalog_url
+        self.host = host
+        self.base_port = base_port
+        self.secret = secret
+        self.restarts = 0
+
+        self._context = multiprocessing.get_context('spawn')
+        self._processes: List[Optional[multiprocessing.process.BaseProcess]] = [None] * count
+        self._stopping = False
+
+    def port(self, index: int) -> int:
+        return self.base_port + index
+
+    def url(self, index: int) -> str:
+        return f'http://{self.host}:{self.port(index)}'
+
+    def _spawn(self, index: int):
+        process = self._context.Process(
+            target=self.target,
+            args=(index, self.catalog_url, self.port(index), self.secret),
+            name=f'bot-worker-{index}',
+            daemon=True,
+        )
+        process.start()
+        self._processes[index] = process
+        logger.info("Воркер %s запущен (pid %s, порт %s)", index, process.pid, self.port(index))
+
+    def start(self):
+        for index in range(self.count):
+            self._spawn(index)
+
+    async def wait_ready(self, timeout: float = 60.0):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        async with httpx.AsyncClient(timeout=2.0) as client:
+            for index in range(self.count):
+                while True:
+                    try:
+                        response = await client.get(f'{self.url(index)}/health')
+                        if response.status_code == 200:
+                            break
+                    except httpx.TransportError:
+                        pass
+                    process = self._processes[index]
+                    if process is not None and not process.is_alive():
+                        raise RuntimeError(f"Воркер {index} завершился при запуске (код {process.exitcode})")
+                    if loop.time() > deadline:
+                        raise RuntimeError(f"Воркер {index} не ответил за {timeout} с")
+                    await asyncio.sleep(0.2)
+        logger.info("Все воркеры готовы: %s", self.count)
+
+    async def supervise(self, interval: float = 1.0):
+        # Упавший воркер перезапускается; его обновления до этого получают 500, и Telegram их повторит
+        while not self._stopping:
+            await asyncio.sleep(interval)
+            for index, process in enumerate(self._processes):
+                if self._stopping:
+                    return
+                if process is not None and not process.is_alive():
+                    logger.error("Воркер %s завершился с кодом %s, перезапускаем", index, process.exitcode)
+                    self.restarts += 1
+                    self._spawn(index)
+
+    def stop(self, timeout: float = 15.0):
+        self._stopping = True
+        for process in self._processes:
+            if process is not None and process.is_alive():
+                process.terminate()
+        for index, process in enumerate(self._processes):
+            if process is None:
+                continue
+            process.join(timeout)
+            if process.is_alive():
+                logger.warning("Воркер %s не остановился за %s с, завершаем принудительно", index, timeout)
+                process.kill()
+                process.join()
+        logger.info("Воркеры остановлены, перезапусков: %s", self.restarts)
+
+
+class UpdateForwarder:
+    def __init__(self, pool: WorkerPool, path: str = '/update'):
+        self.pool = pool
+        self.path = path
+        self.forwarded = [0] * pool.count
+        # Воркер проверяет секрет так же, как вебхук проверяет запросы Telegram
+        self._client = httpx.AsyncClient(
+            timeout=10.0,
+            headers={WEBHOOK_SECRET_HEADER: pool.secret} if pool.secret else None,
+            limits=httpx.Limits(max_connections=64 * pool.count, max_keepalive_connections=16 * pool.count),
+        )
+
+    async def __call__(self, data: Dict[str, Any]):
+        index = shard_key(data) % self.pool.count
+        response = await self._client.post(f'{self.pool.url(index)}{self.path}', json=data)
+        # Ошибка воркера превращается в 500 для Telegram, и обновление будет доставлено повторно
+        response.raise_for_status()
+        self.forwarded[index] += 1
+
+    async def close(self):
+        await self._client.aclose()
+
+
+async def run_cluster(config_manager, bot_token: str, webhook_settings: Dict[str, Any], worker_target: Callable[..., None]):
+    workers_settings = config_manager.get_config('workers') or {}
+    count = workers_settings.get('count', 1)
+    # Секрет между процессами создаётся на каждый запуск и не покидает машину
+    secret = secrets.token_urlsafe(24)
+
+    # Единственная копия каталога: кэш, объединение загрузок, прогрев и снимок живут здесь
+    http_client = HttpClient.from_config(config_manager)
+    response_cache = ResponseCache.from_config(config_manager)
+    data_fetcher = DataFetcher(
+        http_client,
+        response_cache,
+        max_waiters=config_manager.get_config('http', 'max_waiters_per_url') or 1000
+    )
+    warmer = CatalogWarmer.from_config(config_manager, data_fetcher)
+
+    def apply_settings(old: Settings, new: Settings, changed: FrozenSet[str]):
+        # Воркеры следят за файлом сами; главному процессу нужны источники, кэш и периодические задачи
+        if 'data_sources' in changed:
+            data_fetcher.forget(old.data_sources.retired(new.data_sources))
+            if warmer is not None:
+                warmer.configure(new)
+                tasks.append(asyncio.create_task(warmer.warm_up()))
+        if 'cache' in changed and response_cache is not None:
+            response_cache.configure(new.cache)
+        if 'reload' in changed:
+            run_every('config_reload', watcher.check, new.reload_interval, "Ошибка проверки конфигурации")
+        if 'warmup' in changed and warmer is not None:
+            warmer.configure(new)
+            run_every(
+                'catalog_refresh', warmer.warm_up, new.warmup.refresh_interval,
+                "Ошибка фонового обновления каталога"
+            )
+
+    config_manager.subscribe(apply_settings)
+    catalog_server = CatalogServer(
+        data_fetcher,
+        port=workers_settings.get('catalog_port', 8089),
+        secret=secret
+    )
+    pool = WorkerPool(
+        worker_target,
+        count,
+        catalog_server.url,
+        base_port=workers_settings.get('base_port', 8090),
+        secret=secret
+    )
+    forwarder = UpdateForwarder(pool)
+
+    webhook_secret = os.getenv('TELEGRAM_WEBHOOK_SECRET')
+    server = WebhookServer(
+        forwarder,
+        secret_token=webhook_secret,
+        path=webhook_settings.get('path', '/telegram'),
+        health_path=webhook_settings.get('health_path', '/health'),
+        host=webhook_settings.get('listen', '0.0.0.0'),
+        port=webhook_settings.get('port', 8080),
+    )
+    bot_kwargs = {}
+    api_base_url = (config_manager.get_config('bot') or {}).get('api_base_url')
+    if api_base_url:
+        bot_kwargs['base_url'] = api_base_url
+    bot = Bot(bot_token, **bot_kwargs)
+
+    stopped = stop_event()
+    tasks: List[asyncio.Task] = []
+    periodic: Dict[str, asyncio.Task] = {}
+    watcher = ConfigWatcher(config_manager)
+
+    def run_every(name: str, func: Callable[[], Any], interval: Optional[float], error_message: str):
+        # Задача с тем же именем заменяется; нулевой интервал её отключает
+        task = periodic.pop(name, None)
+        if task is not None:
+            task.cancel()
+        if interval:
+            periodic[name] = task = asyncio.create_task(_repeat(func, interval, error_message))
+            tasks.append(task)
+
+    await http_client.start()
+    await catalog_server.start()
+    try:
+        if warmer is not None:
+            if warmer.load_snapshot():
+                tasks.append(asyncio.create_task(warmer.warm_up()))
+            else:
+                await warmer.warm_up()
+
+            run_every(
+                'catalog_refresh', warmer.warm_up, config_manager.settings.warmup.refresh_interval,
+                "Ошибка фонового обновления каталога"
+            )
+
+        run_every('config_reload', watcher.check, config_manager.settings.reload_interval, "Ошибка проверки конфигурации")
+
+        pool.start()
+        await pool.wait_ready(workers_settings.get('start_timeout', 60))
+        tasks.append(asyncio.create_task(pool.supervise()))
+
+        await server.start()
+        async with bot:
+            await bot.set_webhook(
+                url=webhook_settings['url'],
+                secret_token=webhook_secret,
+                allowed_updates=Update.ALL_TYPES,
+                drop_pending_updates=True
+            )
+        logger.info("Бот работает в режиме вебхука с %s воркерами: %s", count, webhook_settings['url'])
+
+        await stopped.wait()
+    finally:
+        logger.info("Остановка кластера")
+        await server.stop()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await asyncio.to_thread(pool.stop)
+        await forwarder.close()
+        await catalog_server.stop()
+        await data_fetcher.close()
+        await http_client.close()
+        logger.info("Обновлений по воркерам: %s", forwarder.forwarded)
+        logger.info("Статистика раздачи каталога: %s", catalog_server.stats())
+        if response_cache is not None:
+            logger.info("Статистика кэша: %s", response_cache.stats())
+
+
+async def _repeat(func: Callable[[], Any], interval: float, error_message: str):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            result = func()
+            if asyncio.iscoroutine(result):
+                await result
+        except Exception as e:
+            logger.error("%s: %s", error_message, e, exc_info=True)
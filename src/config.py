@@ -0,0 +1,346 @@
+# src/config.py
+#
+# config.yaml читается в неизменяемый снимок Settings: секции, нужные обработчикам на каждом
+# обновлении, разобраны и проверены заранее (settings.pagination.models_per_page вместо обхода
+# словарей), остальное доступно через get_config. Один ConfigManager на процесс
+# (ConfigManager.shared) держит текущий снимок; ConfigWatcher по времени изменения файлов
+# подменяет его целиком и оповещает подписчиков о том, какие секции изменились.
+
+import logging
+import os
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Any, Callable, Dict, FrozenSet, List, Mapping, Optional, Tuple
+
+import yaml
+
+# Настройка логгера
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONFIG_PATH = 'config/config.yaml'
+
+# Эти секции читаются только при запуске; их изменение применяется после перезапуска
+RESTART_SECTIONS = frozenset({
+    'bot', 'webhook', 'workers', 'logging', 'metrics', 'concurrency', 'rate_limit', 'http', 'popularity',
+    'persistence',
+})
+# Отдельные ключи секций, которые в остальном применяются на лету
+RESTART_KEYS = frozenset({
+    ('cache', 'enabled'), ('cache', 'message_state_max_entries'),
+    ('warmup', 'enabled'), ('warmup', 'snapshot_path'),
+})
+
+
+class ConfigError(ValueError):
+    """Значение в конфигурации имеет неверный тип или недопустимо."""
+
+
+def _freeze(value: Any) -> Any:
+    if isinstance(value, Mapping):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+def _section(raw: Mapping[str, Any], name: str) -> Mapping[str, Any]:
+    section = raw.get(name)
+    if section is None:
+        return {}
+    if not isinstance(section, Mapping):
+        raise ConfigError(f"секция {name} должна быть словарём")
+    return section
+
+
+def _number(section: Mapping[str, Any], name: str, key: str, default, kind=int, minimum=None, maximum=None):
+    value = section.get(key)
+    if value is None:
+        return default
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or (kind is int and not isinstance(value, int)):
+        raise ConfigError(f"{name}.{key} должно быть числом, получено {value!r}")
+    if (minimum is not None and value < minimum) or (maximum is not None and value > maximum):
+        raise ConfigError(f"{name}.{key} вне допустимого диапазона: {value!r}")
+    return kind(value)
+
+
+def _flag(section: Mapping[str, Any], name: str, key: str, default: bool) -> bool:
+    value = section.get(key)
+    if value is None:
+        return default
+    if not isinstance(value, bool):
+        raise ConfigError(f"{name}.{key} должно быть true или false, получено {value!r}")
+    return value
+
+
+@dataclass(frozen=True, slots=True)
+class DataSourceSettings:
+    manufacturers_url: Optional[str] = None
+    base_model_url: Optional[str] = None
+
+    @classmethod
+    def parse(cls, raw: Mapping[str, Any]) -> 'DataSourceSettings':
+        section = _section(raw, 'data_sources')
+        urls = {}
+        for key in ('manufacturers_url', 'base_model_url'):
+            value = section.get(key)
+            if value is not None and (not isinstance(value, str) or not value):
+                raise ConfigError(f"data_sources.{key} должно быть непустой строкой")
+            urls[key] = value
+        if urls['base_model_url'] is not None and '{model}' not in urls['base_model_url']:
+            raise ConfigError("data_sources.base_model_url должен содержать {model}")
+        return cls(**urls)
+
+    def retired(self, new: 'DataSourceSettings') -> Callable[[str], bool]:
+        # URL этих источников, которые после перехода на new больше не будут запрашиваться
+        manufacturers_url = self.manufacturers_url if self.manufacturers_url != new.manufacturers_url else None
+        prefix = suffix = None
+        if self.base_model_url and self.base_model_url != new.base_model_url:
+            prefix, _, suffix = self.base_model_url.partition('{model}')
+
+        def matches(url: str) -> bool:
+            if url == manufacturers_url:
+                return True
+            return prefix is not None and url.startswith(prefix) and url.endswith(suffix)
+        return matches
+
+
+@dataclass(frozen=True, slots=True)
+class PaginationSettings:
+    manufacturers_per_page: int = 8
+    models_per_page: int = 8
+    manufacturers_columns: int = 2
+
+    @classmethod
+    def parse(cls, raw: Mapping[str, Any]) -> 'PaginationSettings':
+        section = _section(raw, 'pagination')
+        return cls(
+            _number(section, 'pagination', 'manufacturers_per_page', 8, minimum=1),
+            _number(section, 'pagination', 'models_per_page', 8, minimum=1),
+            _number(section, 'pagination', 'manufacturers_columns', 2, minimum=1, maximum=8),
+        )
+
+
+@dataclass(frozen=True, slots=True)
+class LanguageSettings:
+    default: str = 'ru'
+    supported: Tuple[str, ...] = ('ru',)
+
+    @classmethod
+    def parse(cls, raw: Mapping[str, Any]) -> 'LanguageSettings':
+        section = _section(raw, 'languages')
+        supported = section.get('supported') or ('ru',)
+        if not isinstance(supported, (list, tuple)) or not all(isinstance(language, str) and language for language in supported):
+            raise ConfigError("languages.supported должен быть списком кодов языков")
+        default = section.get('default') or supported[0]
+        if default not in supported:
+            raise ConfigError(f"languages.default ({default}) отсутствует в languages.supported")
+        return cls(default, tuple(supported))
+
+
+@dataclass(frozen=True, slots=True)
+class SearchSettings:
+    limit: int = 10
+    min_score: float = 0.3
+
+    @classmethod
+    def parse(cls, raw: Mapping[str, Any]) -> 'SearchSettings':
+        section = _section(raw, 'search')
+        return cls(
+            _number(section, 'search', 'limit', 10, minimum=1),
+            _number(section, 'search', 'min_score', 0.3, kind=float, minimum=0, maximum=1),
+        )
+
+
+@dataclass(frozen=True, slots=True)
+class CacheSettings:
+    enabled: bool = True
+    ttl: float = 300.0
+    stale_while_revalidate: float = 600.0
+    max_entries: int = 256
+    failure_backoff: float = 30.0
+    render_max_entries: int = 2048
+    message_state_max_entries: int = 10000
+
+    @classmethod
+    def parse(cls, raw: Mapping[str, Any]) -> 'CacheSettings':
+        section = _section(raw, 'cache')
+        return cls(
+            _flag(section, 'cache', 'enabled', True),
+            _number(section, 'cache', 'ttl', 300.0, kind=float, minimum=0),
+            _number(section, 'cache', 'stale_while_revalidate', 600.0, kind=float, minimum=0),
+            _number(section, 'cache', 'max_entries', 256, minimum=1),
+            _number(section, 'cache', 'failure_backoff', 30.0, kind=float, minimum=0),
+            _number(section, 'cache', 'render_max_entries', 2048, minimum=1),
+            _number(section, 'cache', 'message_state_max_entries', 10000, minimum=1),
+        )
+
+
+@dataclass(frozen=True, slots=True)
+class WarmupSettings:
+    enabled: bool = False
+    concurrency: int = 8
+    # 0 — фоновое обновление каталога отключено
+    refresh_interval: float = 0.0
+    snapshot_path: Optional[str] = None
+
+    @classmethod
+    def parse(cls, raw: Mapping[str, Any]) -> 'WarmupSettings':
+        section = _section(raw, 'warmup')
+        snapshot_path = section.get('snapshot_path')
+        if snapshot_path is not None and not isinstance(snapshot_path, str):
+            raise ConfigError("warmup.snapshot_path должен быть строкой")
+        return cls(
+            _flag(section, 'warmup', 'enabled', False),
+            _number(section, 'warmup', 'concurrency', 8, minimum=1),
+            _number(section, 'warmup', 'refresh_interval', 0.0, kind=float, minimum=0),
+            snapshot_path or None,
+        )
+
+
+@dataclass(frozen=True, slots=True)
+class Settings:
+    raw: Mapping[str, Any] = field(default_factory=lambda: MappingProxyType({}))
+    data_sources: DataSourceSettings = DataSourceSettings()
+    pagination: PaginationSettings = PaginationSettings()
+    languages: LanguageSettings = LanguageSettings()
+    search: SearchSettings = SearchSettings()
+    cache: CacheSettings = CacheSettings()
+    warmup: WarmupSettings = WarmupSettings()
+    # Интервал проверки изменений config.yaml и файлов локализации; 0 — не проверять
+    reload_interval: float = 5.0
+    # Номер снимка в процессе: растёт при каждой подмене
+    version: int = 0
+
+    @classmethod
+    def parse(cls, raw: Optional[Mapping[str, Any]], version: int = 0) -> 'Settings':
+        if raw is None:
+            raw = {}
+        if not isinstance(raw, Mapping):
+            raise ConfigError("корень конфигурации должен быть словарём")
+        raw = _freeze(raw)
+        return cls(
+            raw,
+            DataSourceSettings.parse(raw),
+            PaginationSettings.parse(raw),
+            LanguageSettings.parse(raw),
+            SearchSettings.parse(raw),
+            CacheSettings.parse(raw),
+            WarmupSettings.parse(raw),
+            _number(_section(raw, 'reload'), 'reload', 'check_interval', 5.0, kind=float, minimum=0),
+            version,
+        )
+
+    def changed_sections(self, other: 'Settings') -> FrozenSet[str]:
+        names = set(self.raw) | set(other.raw)
+        return frozenset(name for name in names if self.raw.get(name) != other.raw.get(name))
+
+    def value(self, section: str, key: str) -> Any:
+        values = self.raw.get(section)
+        return values.get(key) if isinstance(values, Mapping) else None
+
+
+Listener = Callable[[Settings, Settings, FrozenSet[str]], None]
+
+
+class ConfigManager:
+    _shared: Dict[str, 'ConfigManager'] = {}
+
+    def __init__(self, config_path: str = DEFAULT_CONFIG_PATH):
+        self.config_path = config_path
+        self._listeners: List[Listener] = []
+        self._mtime: Optional[int] = None
+        try:
+            raw = self._read()
+            logger.info("Конфигурация успешно загружена из %s", config_path)
+        except FileNotFoundError:
+            logger.error("Файл конфигурации не найден: %s", config_path)
+            raw = {}
+        except yaml.YAMLError as e:
+            logger.error("Ошибка парсинга YAML: %s", e)
+            raw = {}
+        # Недопустимые значения при запуске — ошибка; при перезагрузке остаётся прежний снимок
+        self.settings = Settings.parse(raw, version=1)
+
+    @classmethod
+    def shared(cls, config_path: str = DEFAULT_CONFIG_PATH) -> 'ConfigManager':
+        # Один экземпляр на файл в процессе: main.py, bot.py и обработчики видят один и тот же снимок
+        manager = cls._shared.get(config_path)
+        if manager is None:
+            manager = cls._shared[config_path] = cls(config_path)
+        return manager
+
+    @property
+    def config(self) -> Mapping[str, Any]:
+        return self.settings.raw
+
+    def _read(self) -> Any:
+        with open(self.config_path, 'r', encoding='utf-8') as f:
+            self._mtime = os.fstat(f.fileno()).st_mtime_ns
+            return yaml.safe_load(f)
+
+    def get_config(self, *keys):
+        try:
+            value = self.settings.raw
+            for key in keys:
+                value = value.get(key)
+            return value
+        except Exception as e:
+            logger.error("Ошибка получения конфигурации для ключей %s: %s", keys, e)
+            return None
+
+    def subscribe(self, listener: Listener):
+        self._listeners.append(listener)
+
+    def apply(self, raw: Mapping[str, Any]) -> Settings:
+        # Новый снимок собирается и проверяется полностью, и только потом подменяет текущий
+        old = self.settings
+        new = Settings.parse(raw, version=old.version + 1)
+        changed = new.changed_sections(old)
+        if not changed:
+            return old
+
+        self.settings = new
+        logger.info("Конфигурация обновлена (версия %s), изменены секции: %s", new.version, ', '.join(sorted(changed)))
+        for name in sorted(changed & RESTART_SECTIONS):
+            logger.warning("Изменения секции %s вступят в силу после перезапуска", name)
+        for section, key in sorted(RESTART_KEYS):
+            if section in changed and old.value(section, key) != new.value(section, key):
+                logger.warning("Изменение %s.%s вступит в силу после перезапуска", section, key)
+        for listener in self._listeners:
+            try:
+                listener(old, new, changed)
+            except Exception as e:
+                logger.error("Ошибка применения новой конфигурации: %s", e, exc_info=True)
+        return new
+
+    def reload_changed(self) -> bool:
+        try:
+            mtime = os.stat(self.config_path).st_mtime_ns
+        except OSError:
+            return False
+        if mtime == self._mtime:
+            return False
+
+        try:
+            raw = self._read()
+            self.apply(raw)
+            return True
+        except (OSError, yaml.YAMLError, ConfigError) as e:
+            # Файл мог быть сохранён наполовину; следующая правка перечитает его снова
+            logger.error("Конфигурация %s не применена: %s", self.config_path, e)
+            return False
+
+
+class ConfigWatcher:
+    # Периодическая проверка config.yaml и файлов локализации (задача job_queue или цикл в cluster.py)
+    def __init__(self, config_manager: ConfigManager, locales=None):
+        self.config_manager = config_manager
+        self.locales = locales
+
+    def check(self):
+        self.config_manager.reload_changed()
+        if self.locales is not None:
+            self.locales.reload_changed()
+
+    async def watch_job(self, context):
+        self.check()
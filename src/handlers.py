@@ -1,198 +1,336 @@
 # src/handlers.py
 
 import logging
-from telegram import Update
+import hashlib
+from typing import FrozenSet, Optional
+from telegram import InlineQueryResultArticle, InputTextMessageContent, Update
 from telegram.ext import ContextTypes
-from .utils import ConfigManager, LocaleManager, DataFetcher
+from .callbacks import DETAILS, HOME, LANGUAGE, MANUFACTURERS, MODELS, CallbackRouter
+from .catalog import Manufacturer
+from .config import ConfigManager, Settings
+from .utils import LocaleRegistry, DataFetcher
 from .keyboards import KeyboardBuilder
+from .metrics import track_handler
+from .popularity import PopularitySketch
+from .replies import MessageEditor
+from .search import CatalogSearch
 
 # Настройка логирования
 logger = logging.getLogger(__name__)
 
 
 class BotHandlers:
-    def __init__(self):
-        self.config_manager = ConfigManager()
-        self.default_language = self.config_manager.get_config('languages', 'default')
-
+    def __init__(
+        self,
+        data_fetcher: DataFetcher,
+        config_manager: Optional[ConfigManager] = None,
+        popularity: Optional[PopularitySketch] = None,
+    ):
+        self.config_manager = config_manager or ConfigManager.shared()
+        self.data_fetcher = data_fetcher
+        # Счётчики обращений для упреждающего обновления популярных производителей (см. popularity.py)
+        self.popularity = popularity
+        self.search = CatalogSearch.from_config(self.config_manager, data_fetcher)
+        self.locales = LocaleRegistry.from_config(self.config_manager)
+        self.editor = MessageEditor(self.config_manager.settings.cache.message_state_max_entries)
+        self.config_manager.subscribe(self._apply_settings)
+
+    def _apply_settings(self, old: Settings, new: Settings, changed: FrozenSet[str]):
+        if changed & {'data_sources', 'search'}:
+            self.search.configure(new)
+        if 'languages' in changed:
+            self.locales.configure(new.languages.supported, new.languages.default)
+
+    def build_router(self) -> CallbackRouter:
+        router = CallbackRouter()
+        router.route(HOME, self.start)
+        router.route(MANUFACTURERS, self.handle_manufacturers)
+        router.route(MODELS, self.handle_models)
+        router.route(DETAILS, self.show_model_details)
+        router.route(LANGUAGE, self.handle_language)
+        return router
+
+    @track_handler('start')
     async def start(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         try:
-            locale_manager = LocaleManager(self.default_language)
+            locale_manager = self.locales.resolve(update, context)
             keyboard = KeyboardBuilder.build_main_menu(locale_manager)
 
-            if update.message:
-                await update.message.reply_text(
+            if update.callback_query:
+                await self.editor.edit(
+                    update.callback_query,
                     locale_manager.translate('start_message'),
                     reply_markup=keyboard
                 )
-            elif update.callback_query:
-                await update.callback_query.edit_message_text(
+            elif update.effective_message:
+                await self.editor.reply(
+                    update.effective_message,
                     locale_manager.translate('start_message'),
                     reply_markup=keyboard
                 )
         except Exception as e:
-            logger.error(f"Ошибка в методе start: {e}", exc_info=True)
+            logger.error("Ошибка в методе start: %s", e, exc_info=True)
             if update.callback_query:
-                await update.callback_query.answer("Произошла ошибка. Попробуйте позже.")
+                await self.editor.edit(update.callback_query, self.locales.resolve(update, context).translate('error_generic'))
 
+    @track_handler('handle_manufacturers')
     async def handle_manufacturers(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         try:
-            locale_manager = LocaleManager(self.default_language)
-            page = int(update.callback_query.data.split(':')[1]) if ':' in update.callback_query.data else 0
-            manufacturers_url = self.config_manager.get_config('data_sources', 'manufacturers_url')
+            locale_manager = self.locales.resolve(update, context)
+            page = int(context.args[0]) if context.args else 0
+            # Один снимок конфигурации на всё обновление, даже если его подменят во время загрузки
+            settings = self.config_manager.settings
 
-            manufacturers = DataFetcher.get_manufacturers(manufacturers_url)
-            per_page = self.config_manager.get_config('pagination', 'manufacturers_per_page')
-            columns = self.config_manager.get_config('pagination', 'manufacturers_columns')
+            manufacturers = await self.data_fetcher.get_manufacturer_index(settings.data_sources.manufacturers_url)
 
             keyboard = KeyboardBuilder.build_manufacturers_keyboard(
                 manufacturers,
                 page,
                 locale_manager,
-                per_page,
-                columns
+                settings.pagination.manufacturers_per_page,
+                settings.pagination.manufacturers_columns
             )
 
-            await update.callback_query.edit_message_text(
+            await self.editor.edit(
+                update.callback_query,
                 locale_manager.translate('select_manufacturer'),
                 reply_markup=keyboard
             )
         except Exception as e:
-            logger.error(f"Ошибка в методе handle_manufacturers: {e}", exc_info=True)
-            await update.callback_query.edit_message_text(
-                "Произошла ошибка при загрузке производителей. Попробуйте позже."
+            logger.error("Ошибка в методе handle_manufacturers: %s", e, exc_info=True)
+            await self.editor.edit(
+                update.callback_query,
+                self.locales.resolve(update, context).translate('error_manufacturers')
             )
 
+    @track_handler('handle_models')
     async def handle_models(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         try:
-            locale_manager = LocaleManager(self.default_language)
-            manufacturer_model = update.callback_query.data.split(':')[1]
+            locale_manager = self.locales.resolve(update, context)
+            settings = self.config_manager.settings
+            manufacturer = await self._find_manufacturer(context.args[0], settings)
+            page = int(context.args[1]) if len(context.args) > 1 else 0
 
-            base_model_url = self.config_manager.get_config('data_sources', 'base_model_url')
-            logger.info(f"Загрузка моделей с URL: {base_model_url.format(model=manufacturer_model)}")
+            if manufacturer is None:
+                await self.editor.edit(update.callback_query, locale_manager.translate('models_not_found'))
+                return
+            if self.popularity is not None:
+                self.popularity.record_page(manufacturer.slug, page)
 
-            models_data = DataFetcher.get_models(base_model_url, manufacturer_model)
+            manufacturer_model = manufacturer.slug
+            base_model_url = settings.data_sources.base_model_url
+            logger.debug("Загрузка моделей с URL: %s", base_model_url.format(model=manufacturer_model))
 
-            logger.info(f"Полученные данные моделей: {models_data}")
+            models = await self.data_fetcher.get_model_index(base_model_url, manufacturer_model)
 
-            if not models_data or 'models' not in models_data:
-                logger.error(f"Модели для {manufacturer_model} не найдены")
-                await update.callback_query.edit_message_text("Модели не найдены.")
+            if models is None:
+                logger.error("Модели для %s не найдены", manufacturer_model)
+                await self.editor.edit(update.callback_query, locale_manager.translate('models_not_found'))
                 return
 
-            models = models_data['models']
-            logger.info(f"Количество моделей: {len(models)}")
-
-            per_page = self.config_manager.get_config('pagination', 'models_per_page')
-
-            page_match = update.callback_query.data.split(':')
-            page = int(page_match[2]) if len(page_match) > 2 else 0
+            logger.debug("Количество моделей: %s", len(models))
 
             keyboard = KeyboardBuilder.build_models_keyboard(
                 models,
-                manufacturer_model,
                 page,
                 locale_manager,
-                per_page
+                settings.pagination.models_per_page
             )
 
-            await update.callback_query.edit_message_text(
+            await self.editor.edit(
+                update.callback_query,
                 locale_manager.translate('select_model', manufacturer=manufacturer_model),
                 reply_markup=keyboard
             )
         except Exception as e:
-            logger.error(f"Ошибка в методе handle_models: {e}", exc_info=True)
-            await update.callback_query.edit_message_text(
-                "Произошла ошибка при загрузке моделей. Попробуйте позже."
+            logger.error("Ошибка в методе handle_models: %s", e, exc_info=True)
+            await self.editor.edit(
+                update.callback_query,
+                self.locales.resolve(update, context).translate('error_models')
             )
 
+    @track_handler('show_model_details')
     async def show_model_details(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         try:
-            locale_manager = LocaleManager(self.default_language)
-            manufacturer, model_name = update.callback_query.data.split(':')[1:]
-
-            base_model_url = self.config_manager.get_config('data_sources', 'base_model_url')
-            models_data = DataFetcher.get_models(base_model_url, manufacturer)
-
-            model = next((m for m in models_data.get('models', []) if m['name'] == model_name), None)
-
-            if not model:
-                await update.callback_query.edit_message_text("Модель не найдена.")
+            locale_manager = self.locales.resolve(update, context)
+            manufacturer_key, model_key = context.args
+            settings = self.config_manager.settings
+
+            manufacturer = await self._find_manufacturer(manufacturer_key, settings)
+            models = None
+            if manufacturer is not None:
+                models = await self.data_fetcher.get_model_index(settings.data_sources.base_model_url, manufacturer.slug)
+
+            model = models.get_by_key(model_key) if models is not None else None
+            if model is None:
+                await self.editor.edit(update.callback_query, locale_manager.translate('model_not_found'))
                 return
-
-            # Формируем текст с чувствительностями
-            sensitivities_text = "\n".join([
-                f"• {locale_manager.translate(key)}: {value}"
-                for key, value in model.get('sensitivities', {}).items()
-            ])
-
-            details_text = (
-                f"📱 Модель: {model['name']}\n\n"
-                f"🔍 Производитель: {manufacturer}\n\n"
-                f"🎯 DPI: {model.get('dpi', 'Не указано')}\n"
-                f"🖱️ Кнопка Fire: {model.get('fire_button', 'Не указано')}\n\n"
-                f"Чувствительность:\n{sensitivities_text}"
-            )
+            details_text = KeyboardBuilder.build_model_details_text(models, model, locale_manager)
+            if self.popularity is not None:
+                self.popularity.record_model(manufacturer.slug, model.name)
 
             keyboard = KeyboardBuilder.build_model_details_keyboard(
-                manufacturer,
+                manufacturer.slug,
                 locale_manager
             )
 
-            await update.callback_query.edit_message_text(
+            await self.editor.edit(
+                update.callback_query,
                 details_text,
                 reply_markup=keyboard
             )
         except Exception as e:
-            logger.error(f"Ошибка в методе show_model_details: {e}", exc_info=True)
-            await update.callback_query.edit_message_text(
-                "Произошла ошибка при отображении деталей модели. Попробуйте позже."
+            logger.error("Ошибка в методе show_model_details: %s", e, exc_info=True)
+            await self.editor.edit(
+                update.callback_query,
+                self.locales.resolve(update, context).translate('error_model_details')
+            )
+
+    async def _find_manufacturer(self, key: str, settings: Settings) -> Optional[Manufacturer]:
+        manufacturers = await self.data_fetcher.get_manufacturer_index(settings.data_sources.manufacturers_url)
+        return manufacturers.get_by_key(key)
+
+    @track_handler('handle_search')
+    async def handle_search(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        try:
+            locale_manager = self.locales.resolve(update, context)
+            query = ' '.join(context.args or []).strip()
+
+            if not query:
+                await update.effective_message.reply_text(locale_manager.translate('search_prompt'))
+                return
+
+            hits = await self.search.search(query)
+            logger.info("Поиск '%s': найдено %s", query, len(hits))
+
+            if not hits:
+                await update.effective_message.reply_text(locale_manager.translate('search_no_results', query=query))
+                return
+
+            keyboard = KeyboardBuilder.build_search_results_keyboard(hits, locale_manager)
+            await self.editor.reply(
+                update.effective_message,
+                locale_manager.translate('search_results', query=query),
+                reply_markup=keyboard
             )
+        except Exception as e:
+            logger.error("Ошибка в методе handle_search: %s", e, exc_info=True)
+            if update.effective_message:
+                await update.effective_message.reply_text(self.locales.resolve(update, context).translate('error_search'))
+
+    @track_handler('handle_inline_query')
+    async def handle_inline_query(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        try:
+            locale_manager = self.locales.resolve(update, context)
+            query = update.inline_query.query.strip()
+
+            if not query:
+                await update.inline_query.answer([], cache_time=300, is_personal=True)
+                return
+
+            results = []
+            for hit in await self.search.search(query):
+                details_text = KeyboardBuilder.build_model_details_text(hit.models, hit.model, locale_manager)
+                result_id = hashlib.md5(f"{hit.model.manufacturer}:{hit.model.name}".encode('utf-8')).hexdigest()
+                results.append(InlineQueryResultArticle(
+                    id=result_id,
+                    title=f"{hit.manufacturer_name} {hit.model.name}",
+                    description=f"DPI: {hit.model.dpi if hit.model.dpi is not None else '—'}",
+                    input_message_content=InputTextMessageContent(details_text)
+                ))
+
+            # Карточки на языке пользователя: без is_personal Telegram отдал бы их всем по тому же запросу
+            await update.inline_query.answer(results, cache_time=300, is_personal=True)
+        except Exception as e:
+            logger.error("Ошибка в методе handle_inline_query: %s", e, exc_info=True)
+
+    @track_handler('handle_language')
+    async def handle_language(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        try:
+            requested = context.args[0] if context.args else None
+
+            language = self.locales.normalize(requested)
+            if language is not None:
+                context.user_data['language'] = language
+                await self._save_user_data(update, context)
+
+            locale_manager = self.locales.resolve(update, context)
+
+            if language is not None:
+                text = locale_manager.translate('language_changed', language=locale_manager.translate('language_name'))
+                keyboard = KeyboardBuilder.build_main_menu(locale_manager)
+            else:
+                text = locale_manager.translate('select_language')
+                keyboard = KeyboardBuilder.build_language_keyboard(self.locales, locale_manager)
+
+            if update.callback_query:
+                await self.editor.edit(update.callback_query, text, reply_markup=keyboard)
+            else:
+                # CommandHandler срабатывает и на отредактированные команды, у них update.message пуст
+                await self.editor.reply(update.effective_message, text, reply_markup=keyboard)
+        except Exception as e:
+            logger.error("Ошибка в методе handle_language: %s", e, exc_info=True)
+            if update.callback_query:
+                await self.editor.edit(update.callback_query, self.locales.resolve(update, context).translate('error_generic'))
+
+    @staticmethod
+    async def _save_user_data(update: Update, context: ContextTypes.DEFAULT_TYPE):
+        # Воркеры кластера читают user_data из общей базы перед каждым обновлением (см. persistence.py),
+        # поэтому выбор языка записывается сразу, а не при следующем сохранении по update_interval
+        persistence = context.application.persistence
+        if persistence is not None and update.effective_user is not None:
+            await persistence.update_user_data(update.effective_user.id, dict(context.user_data))
 
     async def handle_support(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         try:
-            locale_manager = LocaleManager(self.default_language)
+            locale_manager = self.locales.resolve(update, context)
 
             support_text = locale_manager.translate('support_message')
             keyboard = KeyboardBuilder.build_support_keyboard(locale_manager)
 
             if update.callback_query:
-                await update.callback_query.edit_message_text(
+                await self.editor.edit(
+                    update.callback_query,
                     support_text,
                     reply_markup=keyboard
                 )
             else:
-                await update.message.reply_text(
+                await self.editor.reply(
+                    update.message,
                     support_text,
                     reply_markup=keyboard
                 )
         except Exception as e:
-            logger.error(f"Ошибка в методе handle_support: {e}", exc_info=True)
+            logger.error("Ошибка в методе handle_support: %s", e, exc_info=True)
             if update.callback_query:
-                await update.callback_query.edit_message_text(
-                    "Произошла ошибка при отображении поддержки. Попробуйте позже."
+                await self.editor.edit(
+                    update.callback_query,
+                    self.locales.resolve(update, context).translate('error_support')
                 )
 
     async def handle_channel(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         try:
-            locale_manager = LocaleManager(self.default_language)
+            locale_manager = self.locales.resolve(update, context)
 
             channel_text = locale_manager.translate('channel_message')
             keyboard = KeyboardBuilder.build_channel_keyboard(locale_manager)
 
             if update.callback_query:
-                await update.callback_query.edit_message_text(
+                await self.editor.edit(
+                    update.callback_query,
                     channel_text,
                     reply_markup=keyboard
                 )
             else:
-                await update.message.reply_text(
+                await self.editor.reply(
+                    update.message,
                     channel_text,
                     reply_markup=keyboard
                 )
         except Exception as e:
-            logger.error(f"Ошибка в методе handle_channel: {e}", exc_info=True)
+            logger.error("Ошибка в методе handle_channel: %s", e, exc_info=True)
             if update.callback_query:
-                await update.callback_query.edit_message_text(
-                    "Произошла ошибка при отображении канала. Попробуйте позже."
+                await self.editor.edit(
+                    update.callback_query,
+                    self.locales.resolve(update, context).translate('error_channel')
                 )
\ No newline at end of file
@@ -0,0 +1,114 @@
+# src/http_client.py
+
+import asyncio
+import inspect
+import logging
+import random
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+# Настройка логгера
+logger = logging.getLogger(__name__)
+
+
+class HttpClient:
+    # Статусы, при которых запрос имеет смысл повторить
+    RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+    def __init__(
+        self,
+        timeout: float = 10.0,
+        connect_timeout: float = 5.0,
+        max_connections: int = 20,
+        max_connections_per_host: int = 10,
+        max_keepalive_connections: int = 10,
+        keepalive_expiry: float = 30.0,
+        retries: int = 3,
+        backoff_factor: float = 0.5,
+        backoff_max: float = 8.0,
+    ):
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.max_connections = max_connections
+        self.max_connections_per_host = max_connections_per_host
+        self.max_keepalive_connections = max_keepalive_connections
+        self.keepalive_expiry = keepalive_expiry
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.backoff_max = backoff_max
+
+        self._client: Optional[httpx.AsyncClient] = None
+        self._host_semaphores: Dict[str, asyncio.Semaphore] = {}
+
+    @classmethod
+    def from_config(cls, config_manager) -> 'HttpClient':
+        settings = config_manager.get_config('http') or {}
+        known = inspect.signature(cls).parameters
+        return cls(**{key: value for key, value in settings.items() if key in known})
+
+    async def start(self):
+        if self._client is not None:
+            return
+
+        # Один пул keep-alive соединений на всё приложение
+        self._client = httpx.AsyncClient(
+            timeout=httpx.Timeout(self.timeout, connect=self.connect_timeout),
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_keepalive_connections,
+                keepalive_expiry=self.keepalive_expiry,
+            ),
+            follow_redirects=True,
+        )
+        logger.info("HTTP-клиент запущен (соединений: %s, на хост: %s)", self.max_connections, self.max_connections_per_host)
+
+    async def close(self):
+        if self._client is None:
+            return
+        await self._client.aclose()
+        self._client = None
+        self._host_semaphores.clear()
+        logger.info("HTTP-клиент остановлен")
+
+    def _host_semaphore(self, url: str) -> asyncio.Semaphore:
+        host = urlsplit(url).netloc
+        semaphore = self._host_semaphores.get(host)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.max_connections_per_host)
+            self._host_semaphores[host] = semaphore
+        return semaphore
+
+    def _backoff(self, attempt: int, response: Optional[httpx.Response] = None) -> float:
+        if response is not None:
+            retry_after = response.headers.get('Retry-After')
+            if retry_after and retry_after.isdigit():
+                return min(float(retry_after), self.backoff_max)
+
+        # Экспоненциальная задержка с небольшим джиттером
+        delay = self.backoff_factor * (2 ** attempt)
+        return min(delay + random.uniform(0, self.backoff_factor), self.backoff_max)
+
+    async def get(self, url: str, headers: Optional[Dict[str, str]] = None) -> httpx.Response:
+        await self.start()
+        semaphore = self._host_semaphore(url)
+
+        attempt = 0
+        while True:
+            try:
+                async with semaphore:
+                    response = await self._client.get(url, headers=headers)
+            except httpx.TransportError as e:
+                if attempt >= self.retries:
+                    raise
+                delay = self._backoff(attempt)
+                logger.warning("Ошибка соединения с %s: %s. Повтор %s/%s через %.2f с", url, e, attempt + 1, self.retries, delay)
+            else:
+                if response.status_code not in self.RETRY_STATUSES or attempt >= self.retries:
+                    return response
+                delay = self._backoff(attempt, response)
+                logger.warning("Ответ %s от %s. Повтор %s/%s через %.2f с", response.status_code, url, attempt + 1, self.retries, delay)
+
+            attempt += 1
+            await asyncio.sleep(delay)
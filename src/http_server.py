@@ -0,0 +1,192 @@
+# src/http_server.py
+
+import asyncio
+import json
+import logging
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, Optional, Set, Tuple
+from urllib.parse import urlsplit
+
+# Настройка логгера
+logger = logging.getLogger(__name__)
+
+REASONS = {
+    200: 'OK',
+    204: 'No Content',
+    304: 'Not Modified',
+    400: 'Bad Request',
+    403: 'Forbidden',
+    404: 'Not Found',
+    405: 'Method Not Allowed',
+    413: 'Payload Too Large',
+    500: 'Internal Server Error',
+    502: 'Bad Gateway',
+    503: 'Service Unavailable',
+}
+
+
+@dataclass
+class Request:
+    method: str
+    path: str
+    query: str
+    headers: Dict[str, str]
+    body: bytes = b''
+
+    def json(self):
+        return json.loads(self.body)
+
+
+@dataclass
+class Response:
+    status: int = 200
+    body: bytes = b''
+    content_type: str = 'text/plain; charset=utf-8'
+    headers: Dict[str, str] = field(default_factory=dict)
+
+    @classmethod
+    def json(cls, data, status: int = 200) -> 'Response':
+        return cls(status, json.dumps(data, ensure_ascii=False).encode('utf-8'), 'application/json')
+
+    @classmethod
+    def text(cls, text: str, status: int = 200) -> 'Response':
+        return cls(status, text.encode('utf-8'))
+
+
+Handler = Callable[[Request], Awaitable[Response]]
+
+
+class HttpServer:
+    # Минимальный HTTP/1.1-сервер на asyncio: вебхук и служебные эндпоинты не требуют отдельного фреймворка
+    def __init__(
+        self,
+        host: str = '127.0.0.1',
+        port: int = 8080,
+        max_body_size: int = 1024 * 1024,
+        read_timeout: float = 30.0,
+    ):
+        self.host = host
+        self.port = port
+        self.max_body_size = max_body_size
+        self.read_timeout = read_timeout
+
+        self._routes: Dict[Tuple[str, str], Handler] = {}
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._connections: Set[asyncio.Task] = set()
+        self._in_flight = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+    def route(self, method: str, path: str, handler: Handler):
+        self._routes[(method.upper(), path)] = handler
+
+    @property
+    def bound_port(self) -> int:
+        # Реальный порт, если сервер запущен с port=0
+        if self._server is None or not self._server.sockets:
+            return self.port
+        return self._server.sockets[0].getsockname()[1]
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        logger.info("HTTP-сервер слушает %s:%s", self.host, self.bound_port)
+
+    async def stop(self, timeout: float = 10.0):
+        if self._server is None:
+            return
+
+        # Перестаём принимать соединения и даём текущим запросам завершиться
+        self._server.close()
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Не все запросы завершились за %s с", timeout)
+
+        for task in list(self._connections):
+            task.cancel()
+        await asyncio.gather(*self._connections, return_exceptions=True)
+        await self._server.wait_closed()
+        self._server = None
+        logger.info("HTTP-сервер остановлен")
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        task = asyncio.current_task()
+        self._connections.add(task)
+        try:
+            keep_alive = True
+            while keep_alive and self._server is not None and self._server.is_serving():
+                request = await self._read_request(reader, writer)
+                if request is None:
+                    break
+
+                self._in_flight += 1
+                self._idle.clear()
+                try:
+                    response = await self._dispatch(request)
+                    keep_alive = request.headers.get('connection', '').lower() != 'close'
+                    await self._write_response(writer, response, keep_alive)
+                finally:
+                    self._in_flight -= 1
+                    if self._in_flight == 0:
+                        self._idle.set()
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError, asyncio.TimeoutError, ValueError):
+            pass
+        except asyncio.CancelledError:
+            pass
+        finally:
+            self._connections.discard(task)
+            writer.close()
+
+    async def _read_request(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> Optional[Request]:
+        try:
+            head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), self.read_timeout)
+        except asyncio.IncompleteReadError:
+            return None
+
+        lines = head.decode('latin-1').split('\r\n')
+        try:
+            method, target, _ = lines[0].split(' ', 2)
+        except ValueError:
+            await self._write_response(writer, Response.text('Bad Request', 400), False)
+            return None
+
+        headers = {}
+        for line in lines[1:]:
+            if ':' in line:
+                name, value = line.split(':', 1)
+                headers[name.strip().lower()] = value.strip()
+
+        length = int(headers.get('content-length') or 0)
+        if length > self.max_body_size:
+            await self._write_response(writer, Response.text('Payload Too Large', 413), False)
+            return None
+
+        body = await asyncio.wait_for(reader.readexactly(length), self.read_timeout) if length else b''
+        target = urlsplit(target)
+        return Request(method.upper(), target.path, target.query, headers, body)
+
+    async def _dispatch(self, request: Request) -> Response:
+        handler = self._routes.get((request.method, request.path))
+        if handler is None:
+            if any(path == request.path for _, path in self._routes):
+                return Response.text('Method Not Allowed', 405)
+            return Response.text('Not Found', 404)
+
+        try:
+            return await handler(request)
+        except Exception as e:
+            logger.error("Ошибка обработки %s %s: %s", request.method, request.path, e, exc_info=True)
+            return Response.text('Internal Server Error', 500)
+
+    async def _write_response(self, writer: asyncio.StreamWriter, response: Response, keep_alive: bool):
+        reason = REASONS.get(response.status, '')
+        headers = {
+            'Content-Type': response.content_type,
+            'Content-Length': str(len(response.body)),
+            'Connection': 'keep-alive' if keep_alive else 'close',
+            **response.headers,
+        }
+        head = f"HTTP/1.1 {response.status} {reason}\r\n"
+        head += ''.join(f"{name}: {value}\r\n" for name, value in headers.items())
+        writer.write(head.encode('latin-1') + b'\r\n' + response.body)
+        await writer.drain()
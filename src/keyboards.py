@@ -1,87 +1,173 @@
 # src/keyboards.py
 
+import functools
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup
-from typing import List, Dict
+from .cache import LRUCache
+from .callbacks import DETAILS, HOME, LANGUAGE, MANUFACTURERS, MODELS, encode
+from .catalog import DeviceModel, ManufacturerIndex, ModelIndex, catalog_key
+
+# Готовые клавиатуры и тексты. Ключи включают версии каталога и локали,
+# поэтому после обновления данных старые записи просто перестают запрашиваться
+render_cache = LRUCache(max_entries=2048)
+
+
+def memoized(key_func):
+    def decorator(build):
+        @functools.wraps(build)
+        def wrapper(*args, **kwargs):
+            return render_cache.get_or_build(key_func(*args, **kwargs), lambda: build(*args, **kwargs))
+
+        def prime(*args, **kwargs) -> bool:
+            # Заранее кладёт результат в кэш (см. popularity.py), не затрагивая статистику попаданий
+            key = key_func(*args, **kwargs)
+            if render_cache.peek(key) is not None:
+                return False
+            value = build(*args, **kwargs)
+            if value is None:
+                return False
+            render_cache.put(key, value)
+            return True
+
+        wrapper.prime = prime
+        return wrapper
+    return decorator
+
 
 class KeyboardBuilder:
     @staticmethod
+    @memoized(lambda locale_manager: ('main_menu', locale_manager.version))
     def build_main_menu(locale_manager):
         keyboard = [
-            [InlineKeyboardButton(locale_manager.translate('sensitivity_settings'), callback_data='manufacturers')],
+            [InlineKeyboardButton(locale_manager.translate('sensitivity_settings'), callback_data=encode(MANUFACTURERS))],
             [InlineKeyboardButton(locale_manager.translate('support'), url='https://t.me/ibremminer837')],
             [InlineKeyboardButton(locale_manager.translate('channel'), url='https://t.me/byteflipper')],
             [InlineKeyboardButton(locale_manager.translate('request_settings'), url='https://t.me/byteflipper_feedback_bot')],
-            [InlineKeyboardButton(locale_manager.translate('download_app'), url='https://play.google.com/store/apps/details?id=com.byteflipper.ffsensitivities')]
+            [InlineKeyboardButton(locale_manager.translate('download_app'), url='https://play.google.com/store/apps/details?id=com.byteflipper.ffsensitivities')],
+            [InlineKeyboardButton(locale_manager.translate('language'), callback_data=encode(LANGUAGE))]
+        ]
+        return InlineKeyboardMarkup(keyboard)
+
+    @staticmethod
+    def build_search_results_keyboard(hits, locale_manager):
+        keyboard = [
+            [InlineKeyboardButton(
+                f"{hit.manufacturer_name} {hit.model.name}",
+                callback_data=encode(DETAILS, catalog_key(hit.model.manufacturer), hit.model.key)
+            )]
+            for hit in hits
+        ]
+        keyboard.append([
+            InlineKeyboardButton(locale_manager.translate('home'), callback_data=encode(HOME))
+        ])
+        return InlineKeyboardMarkup(keyboard)
+
+    @staticmethod
+    @memoized(lambda locales, locale_manager: (
+        'language', locale_manager.version, tuple(locales.get(language).version for language in locales.supported)
+    ))
+    def build_language_keyboard(locales, locale_manager):
+        keyboard = [
+            [InlineKeyboardButton(locales.get(language).translate('language_name'), callback_data=encode(LANGUAGE, language))]
+            for language in locales.supported
         ]
+        keyboard.append([
+            InlineKeyboardButton(locale_manager.translate('home'), callback_data=encode(HOME))
+        ])
         return InlineKeyboardMarkup(keyboard)
 
     @staticmethod
-    def build_manufacturers_keyboard(manufacturers: List[Dict], page: int, locale_manager, per_page: int = 5, columns: int = 2):
-        start_idx = page * per_page
-        end_idx = start_idx + per_page
-        current_manufacturers = manufacturers[start_idx:end_idx]
+    @memoized(lambda manufacturers, page, locale_manager, per_page=5, columns=2: (
+        'manufacturers', locale_manager.version, manufacturers.version, page, per_page, columns
+    ))
+    def build_manufacturers_keyboard(manufacturers: ManufacturerIndex, page: int, locale_manager, per_page: int = 5, columns: int = 2):
+        current_page = manufacturers.page(page, per_page)
+        current_manufacturers = current_page.items
 
         # Создаем клавиатуру с указанным количеством столбцов
         keyboard = []
         for i in range(0, len(current_manufacturers), columns):
             row = [
-                InlineKeyboardButton(m['name'], callback_data=f"manufacturer:{m['model']}")
+                InlineKeyboardButton(m.name, callback_data=encode(MODELS, m.key))
                 for m in current_manufacturers[i:i+columns]
             ]
             keyboard.append(row)
 
         # Кнопки навигации
         nav_row = []
-        if page > 0:
-            nav_row.append(InlineKeyboardButton("⬅️", callback_data=f"manufacturers_page:{page-1}"))
-        if end_idx < len(manufacturers):
-            nav_row.append(InlineKeyboardButton("➡️", callback_data=f"manufacturers_page:{page+1}"))
+        if current_page.has_prev:
+            nav_row.append(InlineKeyboardButton("⬅️", callback_data=encode(MANUFACTURERS, page - 1)))
+        if current_page.has_next:
+            nav_row.append(InlineKeyboardButton("➡️", callback_data=encode(MANUFACTURERS, page + 1)))
 
         if nav_row:
             keyboard.append(nav_row)
 
         # Убираем кнопку "Назад"
         keyboard.append([
-            InlineKeyboardButton(locale_manager.translate('home'), callback_data='home')
+            InlineKeyboardButton(locale_manager.translate('home'), callback_data=encode(HOME))
         ])
 
         return InlineKeyboardMarkup(keyboard)
 
     @staticmethod
-    def build_models_keyboard(models: List[Dict], manufacturer: str, page: int, locale_manager, per_page: int = 5):
-        start_idx = page * per_page
-        end_idx = start_idx + per_page
-        current_models = models[start_idx:end_idx]
+    @memoized(lambda models, page, locale_manager, per_page=5: (
+        'models', locale_manager.version, models.manufacturer, models.version, page, per_page
+    ))
+    def build_models_keyboard(models: ModelIndex, page: int, locale_manager, per_page: int = 5):
+        manufacturer_key = catalog_key(models.manufacturer)
+        current_page = models.page(page, per_page)
 
         keyboard = [
-            [InlineKeyboardButton(m['name'], callback_data=f"model:{manufacturer}:{m['name']}")]
-            for m in current_models
+            [InlineKeyboardButton(m.name, callback_data=encode(DETAILS, manufacturer_key, m.key))]
+            for m in current_page.items
         ]
 
         # Кнопки навигации
         nav_row = []
-        if page > 0:
-            nav_row.append(InlineKeyboardButton("⬅️", callback_data=f"models_page:{manufacturer}:{page-1}"))
-        if end_idx < len(models):
-            nav_row.append(InlineKeyboardButton("➡️", callback_data=f"models_page:{manufacturer}:{page+1}"))
+        if current_page.has_prev:
+            nav_row.append(InlineKeyboardButton("⬅️", callback_data=encode(MODELS, manufacturer_key, page - 1)))
+        if current_page.has_next:
+            nav_row.append(InlineKeyboardButton("➡️", callback_data=encode(MODELS, manufacturer_key, page + 1)))
 
         if nav_row:
             keyboard.append(nav_row)
 
         # Кнопки возврата
         keyboard.append([
-            InlineKeyboardButton(locale_manager.translate('back'), callback_data=f'manufacturer:{manufacturer}'),
-            InlineKeyboardButton(locale_manager.translate('home'), callback_data='home')
+            InlineKeyboardButton(locale_manager.translate('back'), callback_data=encode(MODELS, manufacturer_key)),
+            InlineKeyboardButton(locale_manager.translate('home'), callback_data=encode(HOME))
         ])
 
         return InlineKeyboardMarkup(keyboard)
 
     @staticmethod
+    @memoized(lambda models, model, locale_manager: (
+        'model_details', locale_manager.version, models.manufacturer, models.version, model.name
+    ))
+    def build_model_details_text(models: ModelIndex, model: DeviceModel, locale_manager) -> str:
+        # Формируем текст с чувствительностями
+        sensitivities_text = "\n".join([
+            f"• {locale_manager.translate(key)}: {value}"
+            for key, value in model.sensitivities.items()
+        ])
+        not_specified = locale_manager.translate('not_specified')
+
+        return locale_manager.translate(
+            'model_details',
+            name=model.name,
+            manufacturer=models.manufacturer,
+            dpi=model.dpi if model.dpi is not None else not_specified,
+            fire_button=model.fire_button if model.fire_button is not None else not_specified,
+            sensitivities=sensitivities_text
+        )
+
+    @staticmethod
+    @memoized(lambda manufacturer, locale_manager: ('model_details_keyboard', locale_manager.version, manufacturer))
     def build_model_details_keyboard(manufacturer: str, locale_manager):
         keyboard = [
             [
-                InlineKeyboardButton(locale_manager.translate('back'), callback_data='manufacturers'),
-                InlineKeyboardButton(locale_manager.translate('home'), callback_data='home')
+                InlineKeyboardButton(locale_manager.translate('back'), callback_data=encode(MANUFACTURERS)),
+                InlineKeyboardButton(locale_manager.translate('home'), callback_data=encode(HOME))
             ]
         ]
         return InlineKeyboardMarkup(keyboard)
\ No newline at end of file
@@ -0,0 +1,99 @@
+# src/logging_setup.py
+
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Any, Dict, Optional
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# Стандартные атрибуты LogRecord; всё остальное пришло через extra и попадает в JSON как поля
+_RESERVED = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            'ts': self.formatTime(record, '%Y-%m-%dT%H:%M:%S'),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED and not key.startswith('_'):
+                payload[key] = value
+        if record.exc_info:
+            payload['exc'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            payload['exc'] = record.exc_text
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+class _PreparingQueueHandler(QueueHandler):
+    # В отличие от стандартного prepare() не склеивает traceback с сообщением,
+    # чтобы JSON-форматтер мог вынести его в отдельное поле
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = _exception_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+_exception_formatter = logging.Formatter()
+
+
+def configure_logging(settings: Optional[Dict[str, Any]] = None) -> Optional[QueueListener]:
+    settings = settings or {}
+    level = getattr(logging, str(settings.get('level', 'INFO')).upper(), logging.INFO)
+    log_file = settings.get('file', 'logs/bot.log')
+
+    if settings.get('format', 'text') == 'json':
+        formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter(TEXT_FORMAT)
+
+    handlers = []
+    if log_file:
+        directory = os.path.dirname(log_file)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        file_handler = RotatingFileHandler(
+            log_file,
+            maxBytes=settings.get('max_bytes', 10 * 1024 * 1024),
+            backupCount=settings.get('backup_count', 5),
+            encoding='utf-8'
+        )
+        handlers.append(file_handler)
+    if settings.get('console', False) or not handlers:
+        handlers.append(logging.StreamHandler())
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.setLevel(level)
+
+    # httpx пишет строку на каждый запрос; для нас это шум
+    logging.getLogger('httpx').setLevel(logging.WARNING)
+
+    if not settings.get('queue', True):
+        for handler in handlers:
+            root.addHandler(handler)
+        return None
+
+    # Цикл событий только кладёт запись в очередь, запись на диск идёт в отдельном потоке
+    log_queue = queue.SimpleQueue()
+    root.addHandler(_PreparingQueueHandler(log_queue))
+    listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
@@ -0,0 +1,264 @@
+# src/metrics.py
+
+import bisect
+import functools
+import logging
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from telegram.ext import ContextTypes
+from telegram.request import HTTPXRequest
+
+from .http_server import HttpServer, Request, Response
+
+# Настройка логгера
+logger = logging.getLogger(__name__)
+
+LabelValues = Tuple[str, ...]
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(names: Tuple[str, ...], values: LabelValues, extra: str = '') -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *label_values: str, amount: float = 1):
+        self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def value(self, *label_values: str) -> float:
+        return self._values.get(label_values, 0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        for label_values, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labels, label_values)} {value}")
+        return lines
+
+
+class Gauge:
+    def __init__(self, name: str, help_text: str, collect: Callable[[], Iterable[Tuple[LabelValues, float]]], labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.collect = collect
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} gauge"]
+        for label_values, value in self.collect():
+            lines.append(f"{self.name}{_format_labels(self.labels, label_values)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = (), buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.buckets = tuple(sorted(buckets))
+        # Для каждой комбинации меток: счётчики по корзинам (+Inf в конце), сумма и количество
+        self._series: Dict[LabelValues, List] = {}
+
+    def observe(self, value: float, *label_values: str):
+        index = bisect.bisect_left(self.buckets, value)
+        series = self._series.get(label_values)
+        if series is None:
+            series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][index] += 1
+        series[1] += value
+        series[2] += 1
+
+    def series(self) -> Iterable[LabelValues]:
+        return list(self._series)
+
+    def count(self, *label_values: str) -> int:
+        series = self._series.get(label_values)
+        return series[2] if series else 0
+
+    def quantile(self, q: float, *label_values: str) -> Optional[float]:
+        series = self._series.get(label_values)
+        if not series or not series[2]:
+            return None
+
+        # Линейная интерполяция внутри корзины, как histogram_quantile в Prometheus
+        rank = q * series[2]
+        cumulative = 0
+        for index, count in enumerate(series[0]):
+            if cumulative + count >= rank and count:
+                lower = self.buckets[index - 1] if index > 0 else 0.0
+                if index >= len(self.buckets):
+                    return lower
+                upper = self.buckets[index]
+                return lower + (upper - lower) * (rank - cumulative) / count
+            cumulative += count
+        return self.buckets[-1]
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for label_values, (counts, total, count) in sorted(self._series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                bucket_labels = _format_labels(self.labels, label_values, f'le="{le}"')
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, label_values)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, label_values)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+
+    def _register(self, metric):
+        existing = self._metrics.get(metric.name)
+        if existing is not None:
+            return existing
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help_text: str, labels: Tuple[str, ...] = ()) -> Counter:
+        return self._register(Counter(name, help_text, labels))
+
+    def histogram(self, name: str, help_text: str, labels: Tuple[str, ...] = (), buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help_text, labels, buckets))
+
+    def gauge(self, name: str, help_text: str, collect, labels: Tuple[str, ...] = ()) -> Gauge:
+        gauge = Gauge(name, help_text, collect, labels)
+        self._metrics[name] = gauge
+        return gauge
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            try:
+                lines.extend(metric.render())
+            except Exception as e:
+                logger.error("Ошибка сбора метрики %s: %s", metric.name, e)
+        return '\n'.join(lines) + '\n'
+
+
+# Общий реестр процесса
+metrics = MetricsRegistry()
+
+handler_duration = metrics.histogram(
+    'bot_handler_duration_seconds', 'Время обработки обновления обработчиком', ('handler',)
+)
+handler_errors = metrics.counter(
+    'bot_handler_errors_total', 'Необработанные исключения в обработчиках', ('handler',)
+)
+upstream_duration = metrics.histogram(
+    'bot_upstream_fetch_duration_seconds', 'Время загрузки файлов каталога', ('status',)
+)
+upstream_bytes = metrics.counter(
+    'bot_upstream_fetch_bytes_total', 'Объём загруженных файлов каталога'
+)
+telegram_duration = metrics.histogram(
+    'bot_telegram_request_duration_seconds', 'Время запросов к Telegram Bot API', ('endpoint',)
+)
+telegram_errors = metrics.counter(
+    'bot_telegram_request_errors_total', 'Ошибки запросов к Telegram Bot API', ('endpoint', 'code')
+)
+
+
+def track_handler(name: str):
+    def decorator(handler):
+        @functools.wraps(handler)
+        async def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await handler(*args, **kwargs)
+            except Exception:
+                handler_errors.inc(name)
+                raise
+            finally:
+                handler_duration.observe(time.perf_counter() - started, name)
+        return wrapper
+    return decorator
+
+
+def register_cache_metrics(caches: Dict[str, object]):
+    # Кэши отдают статистику через stats(); метрики считываются в момент запроса /metrics
+    def collect(field: str):
+        def values():
+            for name, cache in caches.items():
+                if cache is not None:
+                    yield (name,), cache.stats()[field]
+        return values
+
+    metrics.gauge('bot_cache_entries', 'Записей в кэше', collect('entries'), ('cache',))
+    metrics.gauge('bot_cache_hits', 'Попаданий в кэш', collect('hits'), ('cache',))
+    metrics.gauge('bot_cache_misses', 'Промахов кэша', collect('misses'), ('cache',))
+    metrics.gauge('bot_cache_hit_ratio', 'Доля попаданий в кэш', collect('hit_ratio'), ('cache',))
+
+
+class InstrumentedRequest(HTTPXRequest):
+    async def do_request(self, url: str, method: str, *args, **kwargs):
+        endpoint = url.rsplit('/', 1)[-1]
+        started = time.perf_counter()
+        try:
+            code, payload = await super().do_request(url, method, *args, **kwargs)
+        except Exception:
+            telegram_errors.inc(endpoint, 'network')
+            raise
+        finally:
+            telegram_duration.observe(time.perf_counter() - started, endpoint)
+
+        if code >= 400:
+            telegram_errors.inc(endpoint, str(code))
+        return code, payload
+
+
+class MetricsServer:
+    def __init__(self, host: str = '127.0.0.1', port: int = 9100, path: str = '/metrics'):
+        self.http_server = HttpServer(host, port)
+        self.http_server.route('GET', path, self.handle_metrics)
+
+    async def handle_metrics(self, request: Request) -> Response:
+        return Response(200, metrics.render().encode('utf-8'), 'text/plain; version=0.0.4; charset=utf-8')
+
+    async def start(self):
+        await self.http_server.start()
+
+    async def stop(self):
+        await self.http_server.stop()
+
+
+def _ms(value: Optional[float]) -> str:
+    return '-' if value is None else f"{value * 1000:.1f}"
+
+
+def summary_line(caches: Optional[Dict[str, object]] = None) -> str:
+    parts = []
+    for (name,) in sorted(handler_duration.series()):
+        parts.append(
+            f"{name}: n={handler_duration.count(name)} "
+            f"p50={_ms(handler_duration.quantile(0.5, name))} "
+            f"p95={_ms(handler_duration.quantile(0.95, name))} "
+            f"p99={_ms(handler_duration.quantile(0.99, name))}мс"
+        )
+    upstream = sum(upstream_duration.count(*series) for series in upstream_duration.series())
+    telegram = sum(telegram_duration.count(*series) for series in telegram_duration.series())
+    parts.append(f"upstream={upstream}")
+    parts.append(f"telegram={telegram}")
+    for name, cache in (caches or {}).items():
+        if cache is not None:
+            parts.append(f"{name}_hit_ratio={cache.stats()['hit_ratio']:.2f}")
+    return '; '.join(parts)
+
+
+def summary_job(caches: Optional[Dict[str, object]] = None):
+    async def job(context: ContextTypes.DEFAULT_TYPE):
+        logger.info("Метрики: %s", summary_line(caches))
+    return job
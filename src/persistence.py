@@ -0,0 +1,125 @@
+# src/persistence.py
+#
+# user_data (выбранный язык) в одной базе SQLite на все процессы. В кластере обновления
+# раскладываются по воркерам по chat_id, а данные принадлежат пользователю: его личный чат
+# и группа могут попасть в разные воркеры. Поэтому воркеры перечитывают user_data из базы
+# перед каждым обновлением (refresh_user_data), а смену языка обработчик записывает сразу.
+# Общая база не зависит от workers.count, так что число воркеров можно менять без потерь.
+
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+from typing import Any, Dict, Optional
+
+from telegram.ext import BasePersistence, PersistenceInput
+
+# Настройка логгера
+logger = logging.getLogger(__name__)
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS user_data (
+    user_id INTEGER PRIMARY KEY,
+    data TEXT NOT NULL
+)
+'''
+
+
+class SqlitePersistence(BasePersistence):
+    def __init__(self, path: str, update_interval: float = 60, shared: bool = False):
+        super().__init__(
+            store_data=PersistenceInput(bot_data=False, chat_data=False, user_data=True, callback_data=False),
+            update_interval=update_interval,
+        )
+        self.path = path
+        # shared — базу одновременно используют несколько процессов (воркеры кластера)
+        self.shared = shared
+        self._db: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._db is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            # WAL: чтение в одних процессах не ждёт записи в других
+            db = sqlite3.connect(self.path, timeout=5.0, check_same_thread=False, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(SCHEMA)
+            self._db = db
+        return self._db
+
+    def _execute(self, sql: str, params: tuple = ()) -> list:
+        with self._lock:
+            return self._connection().execute(sql, params).fetchall()
+
+    async def _run(self, sql: str, params: tuple = ()) -> list:
+        try:
+            return await asyncio.to_thread(self._execute, sql, params)
+        except sqlite3.Error as e:
+            logger.error("Ошибка хранилища пользовательских данных %s: %s", self.path, e)
+            return []
+
+    async def get_user_data(self) -> Dict[int, Dict[Any, Any]]:
+        rows = await self._run("SELECT user_id, data FROM user_data")
+        return {user_id: json.loads(data) for user_id, data in rows}
+
+    async def refresh_user_data(self, user_id: int, user_data: Dict[Any, Any]):
+        # В одном процессе данные в памяти всегда актуальны, перечитывать нечего
+        if not self.shared:
+            return
+        rows = await self._run("SELECT data FROM user_data WHERE user_id = ?", (user_id,))
+        if rows:
+            user_data.update(json.loads(rows[0][0]))
+
+    async def update_user_data(self, user_id: int, data: Dict[Any, Any]):
+        await self._run(
+            "INSERT OR REPLACE INTO user_data (user_id, data) VALUES (?, ?)",
+            (user_id, json.dumps(data, ensure_ascii=False)),
+        )
+
+    async def drop_user_data(self, user_id: int):
+        await self._run("DELETE FROM user_data WHERE user_id = ?", (user_id,))
+
+    async def flush(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    # Остальные данные бот не хранит
+
+    async def get_chat_data(self) -> Dict[int, Any]:
+        return {}
+
+    async def get_bot_data(self) -> Dict[Any, Any]:
+        return {}
+
+    async def get_callback_data(self) -> None:
+        return None
+
+    async def get_conversations(self, name: str) -> Dict:
+        return {}
+
+    async def update_conversation(self, name: str, key, new_state):
+        pass
+
+    async def update_chat_data(self, chat_id: int, data):
+        pass
+
+    async def update_bot_data(self, data):
+        pass
+
+    async def update_callback_data(self, data):
+        pass
+
+    async def drop_chat_data(self, chat_id: int):
+        pass
+
+    async def refresh_chat_data(self, chat_id: int, chat_data):
+        pass
+
+    async def refresh_bot_data(self, bot_data):
+        pass
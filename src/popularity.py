@@ -0,0 +1,287 @@
+# src/popularity.py
+#
+# Учёт популярности производителей, страниц моделей и карточек моделей и упреждающее
+# обновление самых популярных из них. Счётчики хранятся в таблице Space-Saving
+# фиксированного размера (capacity) и затухают экспоненциально с периодом полураспада
+# half_life: вклад обращения часовой давности при half_life=3600 вдвое меньше свежего.
+# Затухание «вперёд»: вес нового обращения растёт со временем, поэтому старые счётчики
+# не нужно пересчитывать, а сравнение записей между собой остаётся корректным.
+
+import asyncio
+import json
+import logging
+import math
+import os
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from telegram.ext import ContextTypes
+
+from .keyboards import KeyboardBuilder
+from .utils import DataFetcher, LocaleRegistry
+
+# Настройка логгера
+logger = logging.getLogger(__name__)
+
+MANUFACTURER = 'm'
+PAGE = 'p'
+MODEL = 'd'
+
+# Показатель степени, после которого счётчики приводятся к новой точке отсчёта (2**64 далеко от переполнения)
+_RESCALE_EXPONENT = 64
+
+
+class PopularitySketch:
+    def __init__(self, capacity: int = 512, half_life: float = 3600.0):
+        self.capacity = capacity
+        self.half_life = half_life
+        # Точка отсчёта — время по часам системы, чтобы затухание продолжалось и между перезапусками
+        self.landmark = time.time()
+        self._counts: Dict[Tuple, float] = {}
+        self.replaced = 0
+
+    @classmethod
+    def from_config(cls, config_manager) -> Optional['PopularitySketch']:
+        settings = config_manager.get_config('popularity') or {}
+        if not settings.get('enabled', False):
+            return None
+        return cls(capacity=settings.get('capacity', 512), half_life=settings.get('half_life', 3600.0))
+
+    def __len__(self) -> int:
+        return len(self._counts)
+
+    def _exponent(self, now: float) -> float:
+        return (now - self.landmark) / self.half_life
+
+    def record(self, key: Tuple, now: Optional[float] = None):
+        now = time.time() if now is None else now
+        exponent = self._exponent(now)
+        if exponent > _RESCALE_EXPONENT:
+            self._rescale(now)
+            exponent = 0.0
+        weight = 2.0 ** exponent
+
+        count = self._counts.get(key)
+        if count is not None:
+            self._counts[key] = count + weight
+        elif len(self._counts) < self.capacity:
+            self._counts[key] = weight
+        else:
+            # Space-Saving: новая запись занимает место самой редкой и наследует её счётчик,
+            # так что часто встречающиеся ключи из таблицы не вытесняются
+            coldest = min(self._counts, key=self._counts.__getitem__)
+            self._counts[key] = self._counts.pop(coldest) + weight
+            self.replaced += 1
+
+    def record_page(self, manufacturer: str, page: int):
+        self.record((MANUFACTURER, manufacturer))
+        self.record((PAGE, manufacturer, page))
+
+    def record_model(self, manufacturer: str, model: str):
+        self.record((MANUFACTURER, manufacturer))
+        self.record((MODEL, manufacturer, model))
+
+    def _rescale(self, now: float):
+        factor = 2.0 ** -self._exponent(now)
+        self._counts = {key: count * factor for key, count in self._counts.items() if count * factor > 1e-9}
+        self.landmark = now
+
+    def score(self, key: Tuple, now: Optional[float] = None) -> float:
+        now = time.time() if now is None else now
+        return self._counts.get(key, 0.0) * 2.0 ** -self._exponent(now)
+
+    def top(self, kind: str, limit: int) -> List[Tuple[Tuple, float]]:
+        # Порядок не зависит от момента времени, поэтому затухание применяется только к результату
+        factor = 2.0 ** -self._exponent(time.time())
+        items = sorted(
+            ((key, count) for key, count in self._counts.items() if key[0] == kind),
+            key=lambda item: item[1],
+            reverse=True
+        )
+        return [(key, count * factor) for key, count in items[:limit]]
+
+    def export(self) -> Dict[str, Any]:
+        return {
+            'landmark': self.landmark,
+            'half_life': self.half_life,
+            'items': [[list(key), count] for key, count in self._counts.items()],
+        }
+
+    def restore(self, snapshot: Dict[str, Any]):
+        landmark = float(snapshot['landmark'])
+        # Счётчики переводятся к текущей точке отсчёта; лишние (если capacity уменьшили) отбрасываются
+        factor = 2.0 ** ((landmark - self.landmark) / self.half_life)
+        items = sorted(
+            ((tuple(key), float(count) * factor) for key, count in snapshot['items']),
+            key=lambda item: item[1],
+            reverse=True
+        )
+        self._counts = {key: count for key, count in items[:self.capacity] if math.isfinite(count)}
+
+    def stats(self) -> Dict[str, Any]:
+        return {'tracked': len(self._counts), 'capacity': self.capacity, 'replaced': self.replaced}
+
+
+class PopularityPrefetcher:
+    # Раз в interval секунд обновляет файлы моделей популярных производителей до истечения срока
+    # свежести и заранее отрисовывает их популярные страницы и карточки моделей
+    def __init__(
+        self,
+        sketch: PopularitySketch,
+        data_fetcher: DataFetcher,
+        config_manager,
+        locales: LocaleRegistry,
+        hot_manufacturers: int = 20,
+        hot_pages: int = 50,
+        hot_models: int = 50,
+        refresh_ahead: float = 60.0,
+        refresh_budget: int = 10,
+        snapshot_path: Optional[str] = None,
+    ):
+        self.sketch = sketch
+        self.data_fetcher = data_fetcher
+        self.config_manager = config_manager
+        self.locales = locales
+        self.hot_manufacturers = hot_manufacturers
+        self.hot_pages = hot_pages
+        self.hot_models = hot_models
+        self.refresh_ahead = refresh_ahead
+        self.refresh_budget = refresh_budget
+        self.snapshot_path = snapshot_path
+
+        self.runs = 0
+        self.refreshed = 0
+        self.rendered = 0
+
+    @classmethod
+    def from_config(
+        cls,
+        config_manager,
+        sketch: Optional[PopularitySketch],
+        data_fetcher: DataFetcher,
+        locales: LocaleRegistry,
+        snapshot_path: Optional[str] = None,
+    ) -> Optional['PopularityPrefetcher']:
+        if sketch is None:
+            return None
+        settings = config_manager.get_config('popularity') or {}
+        return cls(
+            sketch,
+            data_fetcher,
+            config_manager,
+            locales,
+            hot_manufacturers=settings.get('hot_manufacturers', 20),
+            hot_pages=settings.get('hot_pages', 50),
+            hot_models=settings.get('hot_models', 50),
+            refresh_ahead=settings.get('refresh_ahead', 60.0),
+            refresh_budget=settings.get('refresh_budget', 10),
+            snapshot_path=snapshot_path or settings.get('snapshot_path'),
+        )
+
+    def _needs_refresh(self, url: str) -> bool:
+        cache = self.data_fetcher.cache
+        if cache is None:
+            return False
+        entry = cache.peek(url)
+        return entry is None or entry.age() > cache.ttl - self.refresh_ahead
+
+    async def run(self):
+        settings = self.config_manager.settings
+        base_model_url = settings.data_sources.base_model_url
+        manufacturers = [key[1] for key, _ in self.sketch.top(MANUFACTURER, self.hot_manufacturers)]
+        if not manufacturers or not base_model_url:
+            return
+
+        # Популярные записи кэша вытесняются последними
+        hot_urls: Set[str] = {settings.data_sources.manufacturers_url}
+        hot_urls.update(base_model_url.format(model=slug) for slug in manufacturers)
+        if self.data_fetcher.cache is not None:
+            self.data_fetcher.cache.retained = hot_urls
+
+        # Бюджет запросов к источнику расходуется в порядке убывания популярности
+        budget = self.refresh_budget
+        if self._needs_refresh(settings.data_sources.manufacturers_url) and budget > 0:
+            budget -= 1
+            self.refreshed += 1
+            await self.data_fetcher.refresh(settings.data_sources.manufacturers_url)
+        for slug in manufacturers:
+            if budget <= 0:
+                break
+            url = base_model_url.format(model=slug)
+            if self._needs_refresh(url):
+                budget -= 1
+                self.refreshed += 1
+                await self.data_fetcher.refresh(url)
+
+        await self._prerender(settings, base_model_url, manufacturers)
+        self.runs += 1
+
+    async def _prerender(self, settings, base_model_url: str, manufacturers: List[str]):
+        # Только свежие данные: устаревшие запустили бы загрузку сверх бюджета. Кэши читаются
+        # и заполняются в обход статистики, чтобы в метриках оставались только обращения пользователей
+        indexes = {}
+        for slug in manufacturers:
+            index = self.data_fetcher.fresh_model_index(base_model_url, slug)
+            if index is not None:
+                indexes[slug] = index
+
+        locales = [self.locales.get(language) for language in self.locales.supported]
+        per_page = settings.pagination.models_per_page
+        for (_, slug, page), _ in self.sketch.top(PAGE, self.hot_pages):
+            models = indexes.get(slug)
+            if models is None:
+                continue
+            for locale_manager in locales:
+                if KeyboardBuilder.build_models_keyboard.prime(models, page, locale_manager, per_page):
+                    self.rendered += 1
+        for (_, slug, name), _ in self.sketch.top(MODEL, self.hot_models):
+            models = indexes.get(slug)
+            model = models.get(name) if models is not None else None
+            if model is None:
+                continue
+            for locale_manager in locales:
+                if KeyboardBuilder.build_model_details_text.prime(models, model, locale_manager):
+                    self.rendered += 1
+                KeyboardBuilder.build_model_details_keyboard.prime(slug, locale_manager)
+
+    async def prefetch_job(self, context: ContextTypes.DEFAULT_TYPE):
+        try:
+            await self.run()
+            await self.save_snapshot()
+        except Exception as e:
+            logger.error("Ошибка упреждающего обновления каталога: %s", e, exc_info=True)
+
+    def load_snapshot(self) -> bool:
+        if not self.snapshot_path:
+            return False
+        try:
+            with open(self.snapshot_path, 'r', encoding='utf-8') as f:
+                self.sketch.restore(json.load(f))
+        except FileNotFoundError:
+            return False
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.error("Ошибка чтения статистики популярности %s: %s", self.snapshot_path, e)
+            return False
+        logger.info("Статистика популярности загружена: %s записей", len(self.sketch))
+        return True
+
+    async def save_snapshot(self):
+        if not self.snapshot_path:
+            return
+        await asyncio.to_thread(self._write_snapshot, self.sketch.export())
+
+    def _write_snapshot(self, snapshot: Dict[str, Any]):
+        directory = os.path.dirname(self.snapshot_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        tmp_path = f"{self.snapshot_path}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(snapshot, f, ensure_ascii=False, separators=(',', ':'))
+            os.replace(tmp_path, self.snapshot_path)
+        except OSError as e:
+            logger.error("Ошибка записи статистики популярности %s: %s", self.snapshot_path, e)
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.sketch.stats(), 'runs': self.runs, 'refreshed': self.refreshed, 'rendered': self.rendered}
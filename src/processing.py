@@ -0,0 +1,73 @@
+# src/processing.py
+
+import asyncio
+import logging
+import sys
+from typing import Any, Awaitable, Dict, Hashable, Optional
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+# Настройка логгера
+logger = logging.getLogger(__name__)
+
+# Ёмкость семафора базового класса: ограничение по слотам ведёт сам процессор
+_UNBOUNDED = sys.maxsize
+
+
+class ChatOrderedUpdateProcessor(BaseUpdateProcessor):
+    # Обновления разных чатов обрабатываются параллельно, одного чата — строго по очереди.
+    # Каждый чат ждёт своей очереди (asyncio.Lock будит ожидающих в порядке FIFO) и только
+    # потом занимает слот max_concurrent_updates, поэтому очередь одного чата не отнимает
+    # слоты у остальных. Слоты считает собственный семафор в do_process_update: семафор
+    # базового класса берётся в process_update раньше очереди чата, поэтому он не ограничен,
+    # а настоящий предел хранится в limit (application.concurrent_updates его не показывает).
+    def __init__(self, max_concurrent_updates: int):
+        if max_concurrent_updates < 1:
+            raise ValueError("max_concurrent_updates должно быть положительным")
+        super().__init__(_UNBOUNDED)
+        self.limit = max_concurrent_updates
+        self._slots = asyncio.BoundedSemaphore(max_concurrent_updates)
+        self._locks: Dict[Hashable, asyncio.Lock] = {}
+        self._waiters: Dict[Hashable, int] = {}
+
+    @staticmethod
+    def ordering_key(update: object) -> Optional[Hashable]:
+        if not isinstance(update, Update):
+            return None
+        if update.effective_chat is not None:
+            return update.effective_chat.id
+        # У inline-запросов нет чата, порядок сохраняем в пределах пользователя
+        if update.effective_user is not None:
+            return ('user', update.effective_user.id)
+        return None
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]):
+        key = self.ordering_key(update)
+        if key is None:
+            async with self._slots:
+                await coroutine
+            return
+
+        lock = self._locks.get(key)
+        if lock is None:
+            lock = self._locks[key] = asyncio.Lock()
+        self._waiters[key] = self._waiters.get(key, 0) + 1
+
+        try:
+            async with lock:
+                # Общий слот берётся только когда подошла очередь этого чата
+                async with self._slots:
+                    await coroutine
+        finally:
+            # Очереди чатов без ожидающих обновлений удаляются, чтобы словарь не рос
+            self._waiters[key] -= 1
+            if self._waiters[key] == 0:
+                del self._waiters[key]
+                del self._locks[key]
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
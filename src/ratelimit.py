@@ -0,0 +1,154 @@
+# src/ratelimit.py
+
+import asyncio
+import contextlib
+import inspect
+import logging
+import time
+from typing import Any, Callable, Coroutine, Dict, List, Optional, Union
+
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+
+# Настройка логгера
+logger = logging.getLogger(__name__)
+
+JSONDict = Dict[str, Any]
+
+
+class TokenBucket:
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated_at', '_lock')
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def is_idle(self) -> bool:
+        self._refill()
+        return self.tokens >= self.capacity and not self._lock.locked()
+
+    async def acquire(self):
+        # Блокировка выстраивает ожидающих в очередь, чтобы токены выдавались по порядку
+        async with self._lock:
+            self._refill()
+            while self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= 1
+
+
+class TelegramRateLimiter(BaseRateLimiter):
+    def __init__(
+        self,
+        global_rate: float = 30,
+        global_burst: float = 30,
+        chat_rate: float = 1,
+        chat_burst: float = 5,
+        group_rate: float = 20 / 60,
+        group_burst: float = 3,
+        max_retries: int = 3,
+        max_chat_buckets: int = 10000,
+    ):
+        self.global_bucket = TokenBucket(global_rate, global_burst)
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.group_rate = group_rate
+        self.group_burst = group_burst
+        self.max_retries = max_retries
+        self.max_chat_buckets = max_chat_buckets
+
+        self._chat_buckets: Dict[Union[int, str], TokenBucket] = {}
+        self._resume = asyncio.Event()
+        self._resume.set()
+        self.throttled = 0
+        self.retries = 0
+
+    @classmethod
+    def from_config(cls, config_manager, shares: int = 1) -> Optional['TelegramRateLimiter']:
+        settings = config_manager.get_config('rate_limit') or {}
+        if not settings.get('enabled', False):
+            return None
+        known = inspect.signature(cls).parameters
+        kwargs = {key: value for key, value in settings.items() if key in known}
+        if shares > 1:
+            # Общий лимит относится к токену бота: процессы кластера делят его поровну.
+            # Лимиты чатов не делятся — все обновления чата обрабатывает один воркер
+            kwargs['global_rate'] = kwargs.get('global_rate', 30) / shares
+            kwargs['global_burst'] = max(1, kwargs.get('global_burst', 30) / shares)
+        return cls(**kwargs)
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        self._chat_buckets.clear()
+
+    def _chat_bucket(self, chat_id: Union[int, str]) -> TokenBucket:
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            if len(self._chat_buckets) >= self.max_chat_buckets:
+                # Полные корзины ничем не отличаются от новых, их можно выбросить
+                for idle_chat in [c for c, b in self._chat_buckets.items() if b.is_idle()]:
+                    del self._chat_buckets[idle_chat]
+
+            # Отрицательные и строковые id — группы и каналы с более строгим лимитом
+            if isinstance(chat_id, str) or chat_id < 0:
+                bucket = TokenBucket(self.group_rate, self.group_burst)
+            else:
+                bucket = TokenBucket(self.chat_rate, self.chat_burst)
+            self._chat_buckets[chat_id] = bucket
+        return bucket
+
+    async def process_request(
+        self,
+        callback: Callable[..., Coroutine[Any, Any, Union[bool, JSONDict, List[JSONDict]]]],
+        args: Any,
+        kwargs: Dict[str, Any],
+        endpoint: str,
+        data: Dict[str, Any],
+        rate_limit_args: Optional[int],
+    ) -> Union[bool, JSONDict, List[JSONDict]]:
+        max_retries = rate_limit_args if rate_limit_args is not None else self.max_retries
+
+        chat_id = data.get('chat_id')
+        with contextlib.suppress(ValueError, TypeError):
+            chat_id = int(chat_id)
+
+        attempt = 0
+        while True:
+            # Ответы на callback- и inline-запросы не относятся к чату и не ограничиваются
+            if chat_id is not None:
+                started = time.monotonic()
+                await self._chat_bucket(chat_id).acquire()
+                await self.global_bucket.acquire()
+                if time.monotonic() - started > 0.05:
+                    self.throttled += 1
+
+            # После 429 все запросы ждут, пока Telegram снова разрешит отправку
+            await self._resume.wait()
+
+            try:
+                return await callback(*args, **kwargs)
+            except RetryAfter as e:
+                if attempt >= max_retries:
+                    logger.error("Лимит Telegram для %s превышен после %s повторов", endpoint, max_retries)
+                    raise
+
+                attempt += 1
+                self.retries += 1
+                delay = e.retry_after + 0.1
+                logger.warning("Лимит Telegram для %s: повтор %s/%s через %.1f с", endpoint, attempt, max_retries, delay)
+
+                self._resume.clear()
+                try:
+                    await asyncio.sleep(delay)
+                finally:
+                    self._resume.set()
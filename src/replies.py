@@ -0,0 +1,76 @@
+# src/replies.py
+
+import hashlib
+import logging
+from typing import Any, Dict, Hashable, Optional
+
+from telegram import CallbackQuery, InlineKeyboardMarkup, Message
+from telegram.error import BadRequest
+
+from .cache import LRUCache
+
+# Настройка логгера
+logger = logging.getLogger(__name__)
+
+
+def content_digest(text: Optional[str], reply_markup: Optional[InlineKeyboardMarkup] = None) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update((text or '').encode('utf-8'))
+    if reply_markup is not None:
+        digest.update(b'\0')
+        digest.update(reply_markup.to_json().encode('utf-8'))
+    return digest.hexdigest()
+
+
+def _message_key(message: Optional[Message]) -> Optional[Hashable]:
+    if message is None or not message.message_id:
+        return None
+    return (message.chat_id, message.message_id)
+
+
+class MessageEditor:
+    # Помнит хэш последнего отрисованного содержимого каждого сообщения и не отправляет
+    # edit_message_text, если кнопка перерисовала бы то же самое ("message is not modified")
+    def __init__(self, max_entries: int = 10000):
+        self._rendered = LRUCache(max_entries)
+        self.edits = 0
+        self.skipped = 0
+
+    async def edit(self, query: CallbackQuery, text: str, reply_markup: Optional[InlineKeyboardMarkup] = None):
+        key = _message_key(query.message)
+        digest = content_digest(text, reply_markup)
+
+        if key is not None:
+            current = self._rendered.get(key)
+            if current is None and query.message.text is not None:
+                # Сообщение ещё не отслеживается (например, после перезапуска) — сравниваем с тем, что прислал Telegram
+                current = content_digest(query.message.text, query.message.reply_markup)
+            if current == digest:
+                self.skipped += 1
+                return
+
+        try:
+            await query.edit_message_text(text, reply_markup=reply_markup)
+            self.edits += 1
+        except BadRequest as e:
+            if 'not modified' not in str(e).lower():
+                raise
+            self.skipped += 1
+            logger.debug("Сообщение %s не изменилось", key)
+
+        if key is not None:
+            self._rendered.put(key, digest)
+
+    async def reply(self, message: Message, text: str, reply_markup: Optional[InlineKeyboardMarkup] = None) -> Message:
+        sent = await message.reply_text(text, reply_markup=reply_markup)
+        key = _message_key(sent) if isinstance(sent, Message) else None
+        if key is not None:
+            self._rendered.put(key, content_digest(text, reply_markup))
+        return sent
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'tracked': len(self._rendered),
+            'edits': self.edits,
+            'skipped': self.skipped,
+        }
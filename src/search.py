@@ -0,0 +1,211 @@
+# src/search.py
+
+import asyncio
+import heapq
+import logging
+import re
+import sys
+from dataclasses import dataclass
+from itertools import chain
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .cache import LRUCache
+from .catalog import DeviceModel, ManufacturerIndex, ModelIndex
+from .utils import DataFetcher
+
+# Настройка логгера
+logger = logging.getLogger(__name__)
+
+_non_alnum = re.compile(r'[\W_]+', re.UNICODE)
+
+
+def normalize(text: str) -> str:
+    return _non_alnum.sub(' ', text.casefold()).strip()
+
+
+def trigrams(text: str) -> frozenset:
+    # Слова дополняются пробелами, чтобы учитывались их начало и конец
+    grams = set()
+    for token in text.split():
+        padded = f" {token} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return frozenset(grams)
+
+
+@dataclass(frozen=True, slots=True)
+class SearchHit:
+    score: float
+    models: ModelIndex
+    model: DeviceModel
+    manufacturer_name: str
+
+
+class SearchIndex:
+    # Сколько записей из списков триграмм просматривается при наборе кандидатов на один запрос
+    MAX_SCANNED = 512
+
+    def __init__(self, entries: List[Tuple[str, str, ModelIndex, DeviceModel]], generation: int = 0):
+        self.generation = generation
+        self._texts: List[str] = []
+        self._grams: List[frozenset] = []
+        self._entries: List[Tuple[ModelIndex, DeviceModel, str]] = []
+        self._postings: Dict[str, List[int]] = {}
+        # Инлайн-запросы приходят по мере набора и у разных пользователей начинаются одинаково
+        self._results = LRUCache(max_entries=1024)
+
+        for entry_id, (text, manufacturer_name, models, model) in enumerate(entries):
+            # Одинаковые триграммы разных записей — один объект строки
+            grams = frozenset(map(sys.intern, trigrams(text)))
+            self._texts.append(text)
+            self._grams.append(grams)
+            self._entries.append((models, model, manufacturer_name))
+            for gram in grams:
+                self._postings.setdefault(gram, []).append(entry_id)
+
+    @classmethod
+    def build(cls, manufacturers: ManufacturerIndex, model_indexes: Iterable[ModelIndex], generation: int = 0) -> 'SearchIndex':
+        entries = []
+        for models in model_indexes:
+            manufacturer = manufacturers.get(models.manufacturer)
+            manufacturer_name = manufacturer.name if manufacturer is not None else models.manufacturer
+            for model in models:
+                text = normalize(f"{manufacturer_name} {model.name}")
+                entries.append((text, manufacturer_name, models, model))
+        return cls(entries, generation)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def search(self, query: str, limit: int = 10, min_score: float = 0.3) -> List[SearchHit]:
+        text = normalize(query)
+        key = (text, limit, min_score)
+        hits = self._results.get(key)
+        if hits is None:
+            hits = self._search(text, limit, min_score)
+            self._results.put(key, hits)
+        return hits
+
+    def _search(self, text: str, limit: int, min_score: float) -> List[SearchHit]:
+        query_grams = trigrams(text)
+        if not query_grams:
+            return []
+
+        query_size = len(query_grams)
+        # Записи с малым числом общих триграмм не наберут нужный балл, их можно не оценивать
+        min_shared = max(1, int(query_size * min_score))
+        postings = sorted((self._postings[gram] for gram in query_grams if gram in self._postings), key=len)
+        if len(postings) < min_shared:
+            return []
+
+        # Кандидаты набираются из самых редких списков, пока в них не больше MAX_SCANNED записей
+        # (самый редкий берётся целиком). Частые триграммы (« pr», «ra ») есть у заметной доли
+        # каталога и почти ничего не различают: записи, совпавшие с запросом только по ним,
+        # не оцениваются, но общие триграммы найденных кандидатов считаются по всему запросу
+        rare = 1
+        scanned = len(postings[0])
+        while rare < len(postings) and scanned + len(postings[rare]) <= self.MAX_SCANNED:
+            scanned += len(postings[rare])
+            rare += 1
+
+        scored = []
+        for entry_id in set(chain.from_iterable(postings[:rare])):
+            grams = self._grams[entry_id]
+            shared = len(query_grams & grams)
+            if shared < min_shared:
+                continue
+            # Доля запроса, найденная в записи, с небольшим штрафом за длинные названия
+            score = shared / query_size - 0.1 * (1 - shared / len(grams))
+            # Точное вхождение запроса возможно, только если совпали все его триграммы
+            if shared == query_size and text in self._texts[entry_id]:
+                score += 1.0
+            if score >= min_score:
+                scored.append((score, entry_id))
+
+        best = heapq.nsmallest(limit, scored, key=lambda item: (-item[0], self._texts[item[1]]))
+        hits = []
+        for score, entry_id in best:
+            models, model, manufacturer_name = self._entries[entry_id]
+            hits.append(SearchHit(score, models, model, manufacturer_name))
+        return hits
+
+
+class CatalogSearch:
+    def __init__(
+        self,
+        data_fetcher: DataFetcher,
+        manufacturers_url: str,
+        base_model_url: str,
+        limit: int = 10,
+        min_score: float = 0.3,
+    ):
+        self.data_fetcher = data_fetcher
+        self.manufacturers_url = manufacturers_url
+        self.base_model_url = base_model_url
+        self.limit = limit
+        self.min_score = min_score
+
+        self._index: Optional[SearchIndex] = None
+        self._lock = asyncio.Lock()
+        self._rebuild_task: Optional[asyncio.Task] = None
+
+    @classmethod
+    def from_config(cls, config_manager, data_fetcher: DataFetcher) -> 'CatalogSearch':
+        settings = config_manager.settings
+        return cls(
+            data_fetcher,
+            settings.data_sources.manufacturers_url,
+            settings.data_sources.base_model_url,
+            limit=settings.search.limit,
+            min_score=settings.search.min_score,
+        )
+
+    def configure(self, settings):
+        # Новый снимок конфигурации: индекс собирается заново, только если сменились источники
+        data_sources = settings.data_sources
+        if (data_sources.manufacturers_url, data_sources.base_model_url) != (self.manufacturers_url, self.base_model_url):
+            self.manufacturers_url = data_sources.manufacturers_url
+            self.base_model_url = data_sources.base_model_url
+            self._index = None
+        self.limit = settings.search.limit
+        self.min_score = settings.search.min_score
+
+    async def get_index(self) -> SearchIndex:
+        index = self._index
+        if index is not None and index.generation == self.data_fetcher.index_generation:
+            return index
+        if index is not None:
+            # Каталог обновился: пока в фоне собирается новый индекс, отвечает прежний
+            if self._rebuild_task is None or self._rebuild_task.done():
+                self._rebuild_task = asyncio.create_task(self._rebuild_in_background())
+            return index
+        return await self._rebuild()
+
+    async def _rebuild_in_background(self):
+        try:
+            await self._rebuild()
+        except Exception as e:
+            logger.error("Ошибка пересборки поискового индекса: %s", e, exc_info=True)
+
+    async def _rebuild(self) -> SearchIndex:
+        async with self._lock:
+            index = self._index
+            if index is not None and index.generation == self.data_fetcher.index_generation:
+                return index
+
+            sources = (self.manufacturers_url, self.base_model_url)
+            # Данные берутся из кэша; сеть нужна только для ещё не загруженных файлов
+            manufacturers, model_indexes = await self.data_fetcher.load_catalog(*sources)
+            # Сборка на большом каталоге занимает сотни миллисекунд — в отдельном потоке,
+            # чтобы не задерживать обработку остальных обновлений
+            index = await asyncio.to_thread(
+                SearchIndex.build, manufacturers, model_indexes, self.data_fetcher.index_generation
+            )
+            # Источники могли смениться, пока индекс собирался; тогда он уже не нужен
+            if sources == (self.manufacturers_url, self.base_model_url):
+                self._index = index
+            logger.info("Поисковый индекс собран: %s моделей", len(index))
+            return index
+
+    async def search(self, query: str, limit: Optional[int] = None) -> List[SearchHit]:
+        index = await self.get_index()
+        return index.search(query, limit or self.limit, self.min_score)
@@ -0,0 +1,71 @@
+# src/singleflight.py
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+# Настройка логгера
+logger = logging.getLogger(__name__)
+
+
+class SingleFlightOverflow(RuntimeError):
+    """Слишком много ожидающих одного и того же запроса."""
+
+
+class _Call:
+    __slots__ = ('task', 'waiters')
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    # Одновременные вызовы с одним ключом ждут одну общую задачу и получают её результат или исключение
+    def __init__(self, max_waiters: int = 1000):
+        self.max_waiters = max_waiters
+        self._calls: Dict[Hashable, _Call] = {}
+        self.started = 0
+        self.coalesced = 0
+        self.rejected = 0
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    def in_flight(self, key: Hashable) -> bool:
+        return key in self._calls
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> Any:
+        call = self._calls.get(key)
+        if call is None:
+            call = _Call(asyncio.ensure_future(func()))
+            self._calls[key] = call
+            call.task.add_done_callback(lambda task: self._finish(key, call))
+            self.started += 1
+        elif call.waiters >= self.max_waiters:
+            self.rejected += 1
+            raise SingleFlightOverflow(f"Превышено число ожидающих ({self.max_waiters}) для {key}")
+        else:
+            self.coalesced += 1
+
+        call.waiters += 1
+        try:
+            # shield: отмена одного ожидающего не отменяет загрузку для остальных
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+
+    def _finish(self, key: Hashable, call: _Call):
+        if self._calls.get(key) is call:
+            del self._calls[key]
+        # Исключение забирается здесь, чтобы asyncio не ругался, если все ожидающие отменились
+        if not call.task.cancelled() and call.task.exception() is not None and not call.waiters:
+            logger.debug("Общий запрос %s завершился ошибкой без ожидающих: %s", key, call.task.exception())
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'in_flight': len(self._calls),
+            'started': self.started,
+            'coalesced': self.coalesced,
+            'rejected': self.rejected,
+        }
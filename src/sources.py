@@ -0,0 +1,248 @@
+# src/sources.py
+#
+# Источники данных каталога. DataFetcher выбирает источник по схеме URL из data_sources:
+#   https://.../manufacturers.json, https://.../{model}.json   — HTTP (по умолчанию)
+#   file:data/FFSensitivities/manufacturers.json,
+#   file:data/FFSensitivities/{model}.json                     — локальный каталог JSON-файлов
+#   sqlite:data/catalog.db?manufacturers,
+#   sqlite:data/catalog.db?models={model}                      — индексированная база SQLite
+# Абсолютные пути записываются как file:///abs/path и sqlite:///abs/path.db.
+# Все источники отдают данные в формате JSON-файлов репозитория, поэтому кэш,
+# индексы каталога и поиск работают с ними одинаково.
+
+import abc
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import unquote, urlsplit
+
+import httpx
+
+from .http_client import HttpClient
+
+# Настройка логгера
+logger = logging.getLogger(__name__)
+
+NOT_MODIFIED = 304
+
+SQLITE_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS manufacturers (
+    slug TEXT PRIMARY KEY,
+    position INTEGER NOT NULL,
+    data TEXT NOT NULL
+);
+'''
+# Строки моделей ключуются позицией, а не названием: повторы названий сохраняются в исходном
+# порядке, и список и карточки совпадают с HTTP- и файловым источниками (по названию — первая запись)
+SQLITE_MODELS_SCHEMA = '''
+CREATE TABLE models (
+    manufacturer TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (manufacturer, position)
+)
+'''
+
+
+class SourceError(Exception):
+    """Данные не удалось получить из источника."""
+
+
+@dataclass(slots=True)
+class SourceResponse:
+    status: int
+    data: Any = None
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    size: int = 0
+
+
+class DataSource(abc.ABC):
+    @abc.abstractmethod
+    async def load(self, url: str, etag: Optional[str] = None, last_modified: Optional[str] = None) -> SourceResponse:
+        # etag/last_modified — из закэшированной записи; при совпадении источник отвечает NOT_MODIFIED
+        ...
+
+    async def close(self):
+        pass
+
+
+class HttpSource(DataSource):
+    def __init__(self, http_client: HttpClient, headers: Optional[Dict[str, str]] = None):
+        self.http_client = http_client
+        self.headers = headers or {}
+
+    def request_url(self, url: str) -> str:
+        return url
+
+    async def load(self, url: str, etag: Optional[str] = None, last_modified: Optional[str] = None) -> SourceResponse:
+        headers = dict(self.headers)
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+
+        try:
+            response = await self.http_client.get(self.request_url(url), headers=headers or None)
+            if response.status_code == NOT_MODIFIED:
+                return SourceResponse(NOT_MODIFIED, etag=etag, last_modified=last_modified)
+            response.raise_for_status()
+            data = response.json()
+        except httpx.HTTPError as e:
+            raise SourceError(f"ошибка HTTP: {e}") from e
+        except json.JSONDecodeError as e:
+            raise SourceError(f"ошибка декодирования JSON: {e}") from e
+
+        return SourceResponse(
+            response.status_code,
+            data,
+            response.headers.get('ETag'),
+            response.headers.get('Last-Modified'),
+            len(response.content),
+        )
+
+
+def _local_path(url: str) -> str:
+    parts = urlsplit(url)
+    return unquote(parts.netloc + parts.path)
+
+
+class FileSource(DataSource):
+    # Версия файла — время изменения и размер: повторное чтение выполняется, только если файл изменился
+    async def load(self, url: str, etag: Optional[str] = None, last_modified: Optional[str] = None) -> SourceResponse:
+        return await asyncio.to_thread(self._read, _local_path(url), etag)
+
+    @staticmethod
+    def _read(path: str, etag: Optional[str]) -> SourceResponse:
+        try:
+            with open(path, 'rb') as f:
+                stat = os.fstat(f.fileno())
+                version = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+                if version == etag:
+                    return SourceResponse(NOT_MODIFIED, etag=etag)
+                body = f.read()
+            return SourceResponse(200, json.loads(body), version, size=len(body))
+        except OSError as e:
+            raise SourceError(f"ошибка чтения файла {path}: {e}") from e
+        except (json.JSONDecodeError, UnicodeDecodeError) as e:
+            raise SourceError(f"ошибка декодирования JSON в {path}: {e}") from e
+
+
+class SqliteSource(DataSource):
+    # Соединения открываются только на чтение и используются из пула потоков asyncio по очереди
+    def __init__(self):
+        self._connections: Dict[str, Tuple[sqlite3.Connection, threading.Lock]] = {}
+        self._guard = threading.Lock()
+
+    def _connection(self, path: str) -> Tuple[sqlite3.Connection, threading.Lock]:
+        with self._guard:
+            connection = self._connections.get(path)
+            if connection is None:
+                if not os.path.exists(path):
+                    raise SourceError(f"база каталога не найдена: {path}")
+                db = sqlite3.connect(f'file:{path}?mode=ro', uri=True, check_same_thread=False)
+                connection = self._connections[path] = (db, threading.Lock())
+            return connection
+
+    async def load(self, url: str, etag: Optional[str] = None, last_modified: Optional[str] = None) -> SourceResponse:
+        parts = urlsplit(url)
+        path = unquote(parts.netloc + parts.path)
+        return await asyncio.to_thread(self._query, path, unquote(parts.query), etag)
+
+    def _query(self, path: str, query: str, etag: Optional[str]) -> SourceResponse:
+        db, lock = self._connection(path)
+        try:
+            with lock:
+                row = db.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+                version = f'"{row[0]}"' if row else None
+                if version is not None and version == etag:
+                    return SourceResponse(NOT_MODIFIED, etag=etag)
+
+                if query == 'manufacturers':
+                    rows = db.execute("SELECT data FROM manufacturers ORDER BY position").fetchall()
+                    key = 'manufacturers'
+                elif query.startswith('models='):
+                    manufacturer = query[len('models='):]
+                    # Читаются только строки одного производителя по первичному ключу (manufacturer, position)
+                    rows = db.execute(
+                        "SELECT data FROM models WHERE manufacturer = ? ORDER BY position", (manufacturer,)
+                    ).fetchall()
+                    if not rows and db.execute(
+                        "SELECT 1 FROM manufacturers WHERE slug = ?", (manufacturer,)
+                    ).fetchone() is None:
+                        raise SourceError(f"производитель {manufacturer} отсутствует в {path}")
+                    key = 'models'
+                else:
+                    raise SourceError(f"неизвестный запрос к базе каталога: {query!r}")
+        except sqlite3.Error as e:
+            raise SourceError(f"ошибка SQLite в {path}: {e}") from e
+
+        return SourceResponse(
+            200,
+            {key: [json.loads(data) for (data,) in rows]},
+            version,
+            size=sum(len(data) for (data,) in rows),
+        )
+
+    async def close(self):
+        with self._guard:
+            for db, _ in self._connections.values():
+                db.close()
+            self._connections.clear()
+
+
+def import_catalog(path: str, manufacturers: List[Dict], models: Iterable[Tuple[str, List[Dict]]]) -> int:
+    # Полная замена содержимого в одной транзакции: читатели видят либо старый, либо новый каталог
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    db = sqlite3.connect(path)
+    try:
+        db.execute("PRAGMA journal_mode=WAL")
+        db.executescript(SQLITE_SCHEMA)
+        count = 0
+        with db:
+            db.execute("DELETE FROM manufacturers")
+            # Таблица моделей пересоздаётся в той же транзакции: базы со старой схемой
+            # (ключ по названию) переходят на новую при следующем импорте
+            db.execute("DROP TABLE IF EXISTS models")
+            db.execute(SQLITE_MODELS_SCHEMA)
+            db.executemany(
+                "INSERT INTO manufacturers (slug, position, data) VALUES (?, ?, ?)",
+                (
+                    (m['model'], position, json.dumps(m, ensure_ascii=False))
+                    for position, m in enumerate(manufacturers) if 'model' in m
+                )
+            )
+            for manufacturer, items in models:
+                rows = [
+                    (manufacturer, position, m['name'], json.dumps(m, ensure_ascii=False))
+                    for position, m in enumerate(items) if 'name' in m
+                ]
+                db.executemany(
+                    "INSERT INTO models (manufacturer, position, name, data) VALUES (?, ?, ?, ?)", rows
+                )
+                count += len(rows)
+            db.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('version', ?)", (str(time.time_ns()),)
+            )
+        return count
+    finally:
+        db.close()
+
+
+def default_sources(http_client: HttpClient) -> Dict[str, DataSource]:
+    http = HttpSource(http_client)
+    return {'http': http, 'https': http, 'file': FileSource(), 'sqlite': SqliteSource()}
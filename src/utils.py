@@ -1,52 +1,40 @@
 # src/utils.py
 
-import yaml
+import asyncio
 import json
-import requests
 import os
 import logging
-from typing import Dict, List, Optional
+import time
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+from .cache import ResponseCache
+from .catalog import ManufacturerIndex, ModelIndex
+from .http_client import HttpClient
+from .metrics import upstream_bytes, upstream_duration
+from .singleflight import SingleFlight, SingleFlightOverflow
+from .sources import NOT_MODIFIED, DataSource, SourceError, default_sources
 
 # Настройка логгера
 logger = logging.getLogger(__name__)
 
 
-class ConfigManager:
-    def __init__(self, config_path: str = 'config/config.yaml'):
-        try:
-            with open(config_path, 'r', encoding='utf-8') as f:
-                self.config = yaml.safe_load(f)
-            logger.info(f"Конфигурация успешно загружена из {config_path}")
-        except FileNotFoundError:
-            logger.error(f"Файл конфигурации не найден: {config_path}")
-            self.config = {}
-        except yaml.YAMLError as e:
-            logger.error(f"Ошибка парсинга YAML: {e}")
-            self.config = {}
-
-    def get_config(self, *keys):
-        try:
-            value = self.config
-            for key in keys:
-                value = value.get(key)
-            return value
-        except Exception as e:
-            logger.error(f"Ошибка получения конфигурации для ключей {keys}: {e}")
-            return None
-
-
 class LocaleManager:
-    def __init__(self, language: str = 'ru'):
-        locale_path = f'config/locales/{language}.json'
+    def __init__(self, language: str = 'ru', locales_dir: str = 'config/locales'):
+        locale_path = os.path.join(locales_dir, f'{language}.json')
+        self.language = language
+        self.path = locale_path
+        # Версия локали меняется вместе с файлом и входит в ключи кэша отрисовки
+        self.version = (language, None)
         try:
             with open(locale_path, 'r', encoding='utf-8') as f:
+                self.version = (language, os.fstat(f.fileno()).st_mtime_ns)
                 self.translations = json.load(f)
-            logger.info(f"Локализация успешно загружена для языка: {language}")
+            logger.info("Локализация успешно загружена для языка: %s", language)
         except FileNotFoundError:
-            logger.error(f"Файл локализации не найден: {locale_path}")
+            logger.error("Файл локализации не найден: %s", locale_path)
             self.translations = {}
         except json.JSONDecodeError as e:
-            logger.error(f"Ошибка парсинга JSON локализации: {e}")
+            logger.error("Ошибка парсинга JSON локализации: %s", e)
             self.translations = {}
 
     def translate(self, key: str, **kwargs) -> str:
@@ -54,38 +42,220 @@ class LocaleManager:
             template = self.translations.get(key, key)
             return template.format(**kwargs)
         except Exception as e:
-            logger.warning(f"Ошибка перевода для ключа {key}: {e}")
+            logger.warning("Ошибка перевода для ключа %s: %s", key, e)
             return key
 
 
+class LocaleRegistry:
+    def __init__(self, supported: List[str], default: str = 'ru', locales_dir: str = 'config/locales'):
+        self.locales_dir = locales_dir
+        self._locales: Dict[str, LocaleManager] = {}
+        self._mtimes: Dict[str, Optional[int]] = {}
+        self.configure(supported, default)
+
+    @classmethod
+    def from_config(cls, config_manager) -> 'LocaleRegistry':
+        languages = config_manager.settings.languages
+        return cls(languages.supported, default=languages.default)
+
+    def configure(self, supported: List[str], default: str = 'ru'):
+        # Уже загруженные локали переиспользуются, недостающие читаются с диска
+        supported = tuple(supported) or (default,)
+        locales = {language: self._locales[language] for language in supported if language in self._locales}
+        mtimes = {language: self._mtimes.get(language) for language in locales}
+        for language in supported:
+            if language not in locales:
+                locales[language] = LocaleManager(language, self.locales_dir)
+                mtimes[language] = locales[language].version[1]
+
+        self._locales, self._mtimes = locales, mtimes
+        self.supported = supported
+        self.default = default if default in supported else supported[0]
+
+    def _load(self, language: str):
+        locale_manager = LocaleManager(language, self.locales_dir)
+        # Готовый объект подменяется целиком, поэтому читатели никогда не видят его частично загруженным
+        self._locales[language] = locale_manager
+        self._mtimes[language] = locale_manager.version[1]
+
+    def reload_changed(self):
+        # Вызывается ConfigWatcher; сами обработчики файловую систему не опрашивают
+        for language in self.supported:
+            try:
+                mtime = os.stat(os.path.join(self.locales_dir, f'{language}.json')).st_mtime_ns
+            except OSError:
+                mtime = None
+            if mtime != self._mtimes.get(language):
+                logger.info("Файл локализации %s изменился, перезагружаем", language)
+                self._load(language)
+
+    def normalize(self, language_code: Optional[str]) -> Optional[str]:
+        if not language_code:
+            return None
+        # 'en-US' -> 'en'
+        language = language_code.replace('_', '-').split('-')[0].lower()
+        return language if language in self.supported else None
+
+    def get(self, language: Optional[str] = None) -> LocaleManager:
+        return self._locales[self.normalize(language) or self.default]
+
+    def resolve(self, update, context=None) -> LocaleManager:
+        # Сохранённый выбор пользователя важнее языка клиента Telegram
+        preference = None
+        if context is not None and context.user_data is not None:
+            preference = context.user_data.get('language')
+
+        user = update.effective_user if update is not None else None
+        client_language = user.language_code if user is not None else None
+
+        return self.get(self.normalize(preference) or self.normalize(client_language))
+
+
 class DataFetcher:
-    @staticmethod
-    def fetch_json(url: str) -> Optional[Dict]:
-        try:
-            logger.info(f"Попытка загрузки JSON с URL: {url}")
-            response = requests.get(url, timeout=10)
-            response.raise_for_status()
-            data = response.json()
-            logger.info(f"JSON успешно загружен. Количество ключей: {len(data) if data else 0}")
-            return data
-        except requests.RequestException as e:
-            logger.error(f"Ошибка при загрузке данных с {url}: {e}")
+    def __init__(
+        self,
+        http_client: HttpClient,
+        cache: Optional[ResponseCache] = None,
+        max_waiters: int = 1000,
+        sources: Optional[Dict[str, DataSource]] = None,
+    ):
+        self.http_client = http_client
+        self.cache = cache
+        # Источник выбирается по схеме URL: http(s), file или sqlite
+        self.sources = sources if sources is not None else default_sources(http_client)
+        # Одна загрузка на URL одновременно, сколько бы пользователей ни ждали её результата
+        self.flights = SingleFlight(max_waiters)
+        self._revalidation_tasks: Dict[str, asyncio.Task] = {}
+        self._indexes: Dict[str, Tuple[Dict, Union[ManufacturerIndex, ModelIndex]]] = {}
+        # Растёт при каждой пересборке индекса; по нему зависимые структуры узнают об обновлении каталога
+        self.index_generation = 0
+
+    async def fetch_json(self, url: str) -> Optional[Dict]:
+        if self.cache is None:
+            return await self._load(url)
+
+        entry = self.cache.get(url)
+        if entry is not None and self.cache.is_fresh(entry):
+            self.cache.hits += 1
+            return entry.data
+
+        if entry is not None and self.cache.is_usable_stale(entry):
+            # В пределах stale_while_revalidate отдаём устаревшие данные сразу и обновляем их в фоне
+            self.cache.stale_hits += 1
+            self._schedule_revalidation(url)
+            return entry.data
+
+        if self.cache.backing_off(url):
+            # Источник недавно не ответил — не повторяем запрос на каждое обновление;
+            # до следующей попытки отдаём последние полученные данные, если они есть
+            if entry is not None:
+                self.cache.expired_hits += 1
+                return entry.data
+            self.cache.misses += 1
             return None
-        except json.JSONDecodeError as e:
-            logger.error(f"Ошибка декодирования JSON с {url}: {e}")
+
+        # Данные старше ttl + stale_while_revalidate не отдаются без попытки загрузить свежие
+        self.cache.misses += 1
+        return await self._load(url)
+
+    async def refresh(self, url: str) -> Optional[Dict]:
+        # Принудительное обновление в обход срока свежести (условным запросом)
+        return await self._load(url)
+
+    def _schedule_revalidation(self, url: str):
+        if url in self._revalidation_tasks or self.cache.backing_off(url):
+            return
+        task = asyncio.create_task(self._load(url))
+        self._revalidation_tasks[url] = task
+        task.add_done_callback(lambda _: self._revalidation_tasks.pop(url, None))
+
+    async def _load(self, url: str) -> Optional[Dict]:
+        try:
+            return await self.flights.do(url, lambda: self._download(url))
+        except SingleFlightOverflow as e:
+            logger.warning("%s", e, extra={'url': url})
+            return self._stale_fallback(url, self.cache.get(url) if self.cache is not None else None)
+
+    async def _download(self, url: str) -> Optional[Dict]:
+        entry = self.cache.get(url) if self.cache is not None else None
+
+        try:
+            logger.info("Попытка загрузки JSON с URL: %s", url)
+            source = self._source(url)
+            if entry is not None and (entry.etag or entry.last_modified):
+                self.cache.revalidations += 1
+            started = time.perf_counter()
+            try:
+                response = await source.load(
+                    url,
+                    entry.etag if entry is not None else None,
+                    entry.last_modified if entry is not None else None
+                )
+            except SourceError:
+                upstream_duration.observe(time.perf_counter() - started, 'error')
+                raise
+            upstream_duration.observe(time.perf_counter() - started, str(response.status))
+            upstream_bytes.inc(amount=response.size)
+
+            if response.status == NOT_MODIFIED:
+                if entry is None:
+                    raise SourceError("источник ответил 304 без закэшированных данных")
+                # Данные не изменились — продлеваем срок жизни записи
+                self.cache.not_modified += 1
+                entry.touch()
+                logger.info("Данные с %s не изменились (304)", url, extra={'url': url, 'status': 304})
+                return entry.data
+
+            data = response.data
+            logger.info(
+                "JSON успешно загружен. Количество ключей: %s", len(data) if data else 0,
+                extra={'url': url, 'status': response.status, 'bytes': response.size}
+            )
+        except SourceError as e:
+            logger.error("Ошибка при загрузке данных с %s: %s", url, e, extra={'url': url})
+            if self.cache is not None:
+                self.cache.mark_failed(url)
+            return self._stale_fallback(url, entry)
+
+        if self.cache is not None:
+            self.cache.put(url, data, response.etag, response.last_modified)
+        return data
+
+    def _source(self, url: str) -> DataSource:
+        scheme = url.split(':', 1)[0].lower() if ':' in url else 'file'
+        source = self.sources.get(scheme)
+        if source is None:
+            raise SourceError(f"неподдерживаемая схема источника данных: {scheme}")
+        return source
+
+    async def close(self):
+        for source in set(self.sources.values()):
+            await source.close()
+
+    def forget(self, predicate: Callable[[str], bool]) -> int:
+        # Убирает из кэша и индексов URL, которые больше не используются (например, после смены data_sources)
+        for url in [url for url in self._indexes if predicate(url)]:
+            del self._indexes[url]
+        return self.cache.discard(predicate) if self.cache is not None else 0
+
+    def _stale_fallback(self, url: str, entry) -> Optional[Dict]:
+        if entry is None:
             return None
+        logger.warning("Используем устаревшие данные из кэша для %s", url)
+        return entry.data
 
-    @staticmethod
-    def get_manufacturers(url: str) -> List[Dict]:
-        logger.info(f"Получение списка производителей из {url}")
-        data = DataFetcher.fetch_json(url)
+    async def get_manufacturers(self, url: str) -> List[Dict]:
+        logger.info("Получение списка производителей из %s", url)
+        data = await self.fetch_json(url)
+        return self._production_manufacturers(data)
 
+    def _production_manufacturers(self, data: Optional[Dict]) -> List[Dict]:
         if data is None:
             logger.error("Не удалось загрузить данные о производителях")
             return []
 
         if 'manufacturers' not in data:
-            logger.error(f"Ключ 'manufacturers' отсутствует. Доступные ключи: {data.keys()}")
+            logger.error("Ключ 'manufacturers' отсутствует. Доступные ключи: %s", data.keys())
             return []
 
         manufacturers = [
@@ -93,41 +263,126 @@ class DataFetcher:
             if manufacturer.get('showInProductionApp', False)
         ]
 
-        logger.info(f"Найдено производителей: {len(manufacturers)}")
-        for manufacturer in manufacturers:
-            logger.info(f"Производитель: {manufacturer.get('name', 'Неизвестно')}, "
-                        f"showInProductionApp: {manufacturer.get('showInProductionApp')}")
+        logger.info("Найдено производителей: %s", len(manufacturers))
+        if logger.isEnabledFor(logging.DEBUG):
+            for manufacturer in manufacturers:
+                logger.debug("Производитель: %s, showInProductionApp: %s", manufacturer.get('name', 'Неизвестно'), manufacturer.get('showInProductionApp'))
 
         return manufacturers
 
-    @staticmethod
-    def get_models(base_url: str, model: str) -> Optional[Dict]:
-        logger.info(f"Получение моделей для {model}")
+    async def get_manufacturer_index(self, url: str) -> ManufacturerIndex:
+        data = await self.fetch_json(url)
+        return self._manufacturer_index(url, data)
+
+    def _manufacturer_index(self, url: str, data: Optional[Dict]) -> ManufacturerIndex:
+        index = self._cached_index(url, data)
+        if index is None:
+            index = ManufacturerIndex.from_raw(self._production_manufacturers(data))
+            self._store_index(url, data, index)
+        return index
+
+    async def get_model_index(self, base_url: str, model: str) -> Optional[ModelIndex]:
         url = base_url.format(model=model)
+        data = await self.fetch_json(url)
+        return self._model_index(url, model, data)
 
-        try:
-            data = DataFetcher.fetch_json(url)
+    def fresh_model_index(self, base_url: str, model: str) -> Optional[ModelIndex]:
+        # Только по свежей записи кэша: без загрузки и без учёта в статистике попаданий
+        url = base_url.format(model=model)
+        entry = self.cache.peek(url) if self.cache is not None else None
+        if entry is None or not self.cache.is_fresh(entry):
+            return None
+        return self._model_index(url, model, entry.data)
+
+    def _model_index(self, url: str, model: str, data: Optional[Dict]) -> Optional[ModelIndex]:
+        index = self._cached_index(url, data)
+        if index is not None:
+            return index
 
-            if data is None:
-                logger.error(f"Не удалось загрузить модели для {model}")
-                return None
+        if self._validated_models(model, data) is None:
+            return None
 
-            # Добавляем подробное логирование
-            logger.info(f"Полученные данные: {json.dumps(data, indent=2)}")
+        index = ModelIndex.from_raw(data['models'], model)
+        self._store_index(url, data, index)
+        return index
 
-            if 'models' not in data:
-                logger.error(f"Ключ 'models' отсутствует в данных для {model}")
-                logger.error(f"Доступные ключи: {list(data.keys())}")
-                return None
+    async def load_catalog(
+        self,
+        manufacturers_url: str,
+        base_model_url: str,
+        concurrency: int = 8,
+        refresh: bool = False,
+    ) -> Tuple[ManufacturerIndex, List[ModelIndex]]:
+        # Прогрев и пересборка поиска — фоновая работа: они читают кэш в обход статистики попаданий
+        data = await self._background_json(manufacturers_url, refresh)
+        if refresh and data is None:
+            return ManufacturerIndex(()), []
 
-            logger.info(f"Получено моделей: {len(data['models'])}")
+        manufacturers = self._manufacturer_index(manufacturers_url, data)
+        semaphore = asyncio.Semaphore(concurrency)
 
-            # Логируем детали каждой модели
-            for m in data['models']:
-                logger.info(f"Модель: {m.get('name', 'Без имени')}")
+        async def load_models(manufacturer) -> Optional[ModelIndex]:
+            async with semaphore:
+                url = base_model_url.format(model=manufacturer.slug)
+                return self._model_index(url, manufacturer.slug, await self._background_json(url, refresh))
 
-            return data
+        models = await asyncio.gather(*(load_models(m) for m in manufacturers))
+        return manufacturers, [m for m in models if m is not None]
 
+    async def _background_json(self, url: str, refresh: bool = False) -> Optional[Dict]:
+        # Как fetch_json, но без учёта в статистике и без продления записи в LRU; устаревшие
+        # сверх stale_while_revalidate данные (или все при refresh) загружаются заново
+        if not refresh and self.cache is not None:
+            entry = self.cache.peek(url)
+            if entry is not None and self.cache.is_usable_stale(entry):
+                return entry.data
+            if self.cache.backing_off(url):
+                return entry.data if entry is not None else None
+        return await self._load(url)
+
+    def _cached_index(self, url: str, data: Optional[Dict]):
+        # Индекс пересобирается только когда из кэша пришёл новый объект данных
+        cached = self._indexes.get(url)
+        if cached is not None and data is not None and cached[0] is data:
+            return cached[1]
+        return None
+
+    def _store_index(self, url: str, data: Optional[Dict], index):
+        if data is not None:
+            self._indexes[url] = (data, index)
+            self.index_generation += 1
+            logger.info("Индекс каталога для %s собран (версия %s, записей: %s)", url, index.version, len(index))
+
+    async def get_models(self, base_url: str, model: str) -> Optional[Dict]:
+        logger.info("Получение моделей для %s", model)
+        url = base_url.format(model=model)
+
+        try:
+            data = await self.fetch_json(url)
+            return self._validated_models(model, data)
         except Exception as e:
-            logger.error(f"Непредвиденная ошибка при получении моделей для {model}: {e}", exc_info=True)
-            return None
\ No newline at end of file
+            logger.error("Непредвиденная ошибка при получении моделей для %s: %s", model, e, exc_info=True)
+            return None
+
+    def _validated_models(self, model: str, data: Optional[Dict]) -> Optional[Dict]:
+        if data is None:
+            logger.error("Не удалось загрузить модели для %s", model)
+            return None
+
+        # Полный дамп данных только в режиме отладки: сериализация стоит O(размера файла)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Полученные данные: %s", json.dumps(data, ensure_ascii=False))
+
+        if 'models' not in data:
+            logger.error("Ключ 'models' отсутствует в данных для %s", model)
+            logger.error("Доступные ключи: %s", list(data.keys()))
+            return None
+
+        logger.info("Получено моделей: %s", len(data['models']))
+
+        # Логируем детали каждой модели
+        if logger.isEnabledFor(logging.DEBUG):
+            for m in data['models']:
+                logger.debug("Модель: %s", m.get('name', 'Без имени'))
+
+        return data
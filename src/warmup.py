@@ -0,0 +1,116 @@
+# src/warmup.py
+
+import asyncio
+import json
+import logging
+import os
+from typing import Optional
+
+from telegram.ext import ContextTypes
+
+from .utils import DataFetcher
+
+# Настройка логгера
+logger = logging.getLogger(__name__)
+
+
+class CatalogWarmer:
+    def __init__(
+        self,
+        data_fetcher: DataFetcher,
+        manufacturers_url: str,
+        base_model_url: str,
+        snapshot_path: Optional[str] = None,
+        concurrency: int = 8,
+    ):
+        self.data_fetcher = data_fetcher
+        self.manufacturers_url = manufacturers_url
+        self.base_model_url = base_model_url
+        self.snapshot_path = snapshot_path
+        self.concurrency = concurrency
+
+    @classmethod
+    def from_config(cls, config_manager, data_fetcher: DataFetcher) -> Optional['CatalogWarmer']:
+        settings = config_manager.settings
+        if not settings.warmup.enabled:
+            return None
+        return cls(
+            data_fetcher,
+            settings.data_sources.manufacturers_url,
+            settings.data_sources.base_model_url,
+            snapshot_path=settings.warmup.snapshot_path,
+            concurrency=settings.warmup.concurrency,
+        )
+
+    def configure(self, settings):
+        self.manufacturers_url = settings.data_sources.manufacturers_url
+        self.base_model_url = settings.data_sources.base_model_url
+        self.concurrency = settings.warmup.concurrency
+
+    async def warm_up(self) -> int:
+        logger.info("Прогрев каталога: загрузка производителей и моделей")
+        manufacturers, models = await self.data_fetcher.load_catalog(
+            self.manufacturers_url,
+            self.base_model_url,
+            concurrency=self.concurrency,
+            refresh=True
+        )
+
+        if not manufacturers:
+            logger.error("Прогрев каталога прерван: список производителей недоступен")
+            return 0
+
+        loaded = len(models)
+        logger.info("Прогрев каталога завершён: загружено %s из %s файлов моделей", loaded, len(manufacturers))
+
+        await self.save_snapshot()
+        return loaded
+
+    async def refresh_job(self, context: ContextTypes.DEFAULT_TYPE):
+        try:
+            await self.warm_up()
+        except Exception as e:
+            logger.error("Ошибка фонового обновления каталога: %s", e, exc_info=True)
+
+    def load_snapshot(self) -> bool:
+        cache = self.data_fetcher.cache
+        if not self.snapshot_path or cache is None:
+            return False
+
+        try:
+            with open(self.snapshot_path, 'r', encoding='utf-8') as f:
+                snapshot = json.load(f)
+        except FileNotFoundError:
+            logger.info("Снимок каталога не найден: %s", self.snapshot_path)
+            return False
+        except (OSError, json.JSONDecodeError) as e:
+            logger.error("Ошибка чтения снимка каталога %s: %s", self.snapshot_path, e)
+            return False
+
+        for url, (data, etag, last_modified) in snapshot.items():
+            cache.restore(url, data, etag, last_modified)
+
+        logger.info("Снимок каталога загружен: %s записей", len(snapshot))
+        return True
+
+    async def save_snapshot(self):
+        cache = self.data_fetcher.cache
+        if not self.snapshot_path or cache is None:
+            return
+        # Запись на диск не должна блокировать цикл событий
+        await asyncio.to_thread(self._write_snapshot, cache.export())
+
+    def _write_snapshot(self, snapshot: dict):
+        directory = os.path.dirname(self.snapshot_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # Пишем во временный файл и атомарно подменяем снимок
+        tmp_path = f"{self.snapshot_path}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(snapshot, f, ensure_ascii=False, separators=(',', ':'))
+            os.replace(tmp_path, self.snapshot_path)
+            logger.info("Снимок каталога сохранён: %s (%s записей)", self.snapshot_path, len(snapshot))
+        except OSError as e:
+            logger.error("Ошибка записи снимка каталога %s: %s", self.snapshot_path, e)
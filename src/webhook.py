@@ -0,0 +1,150 @@
+# src/webhook.py
+
+import asyncio
+import hmac
+import json
+import logging
+import os
+import signal
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from telegram import Update
+from telegram.ext import Application
+
+from .http_server import HttpServer, Request, Response
+
+# Настройка логгера
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = 'x-telegram-bot-api-secret-token'
+
+
+class WebhookServer:
+    def __init__(
+        self,
+        process_update: Callable[[Dict[str, Any]], Awaitable[None]],
+        secret_token: Optional[str] = None,
+        path: str = '/telegram',
+        health_path: str = '/health',
+        host: str = '127.0.0.1',
+        port: int = 8080,
+    ):
+        self.process_update = process_update
+        self.secret_token = secret_token
+        self.path = path
+        self.health_path = health_path
+        self.started_at = time.monotonic()
+        self.updates_received = 0
+        self.updates_rejected = 0
+
+        self.http_server = HttpServer(host, port)
+        self.http_server.route('POST', path, self.handle_update)
+        self.http_server.route('GET', health_path, self.handle_health)
+
+        if not secret_token:
+            logger.warning("Секретный токен вебхука не задан: входящие запросы не проверяются")
+
+    async def start(self):
+        await self.http_server.start()
+
+    async def stop(self):
+        await self.http_server.stop()
+
+    async def handle_update(self, request: Request) -> Response:
+        if self.secret_token:
+            received = request.headers.get(SECRET_HEADER, '')
+            if not hmac.compare_digest(received.encode('utf-8'), self.secret_token.encode('utf-8')):
+                self.updates_rejected += 1
+                logger.warning("Отклонён запрос вебхука с неверным секретным токеном")
+                return Response.text('Forbidden', 403)
+
+        try:
+            data = request.json()
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            self.updates_rejected += 1
+            return Response.text('Bad Request', 400)
+
+        if not isinstance(data, dict) or 'update_id' not in data:
+            self.updates_rejected += 1
+            return Response.text('Bad Request', 400)
+
+        self.updates_received += 1
+        await self.process_update(data)
+        return Response(200)
+
+    async def handle_health(self, request: Request) -> Response:
+        return Response.json({
+            'status': 'ok',
+            'uptime': round(time.monotonic() - self.started_at, 1),
+            'updates_received': self.updates_received,
+            'updates_rejected': self.updates_rejected,
+        })
+
+
+def stop_event() -> asyncio.Event:
+    # Событие остановки по SIGINT/SIGTERM для процессов, которые сами управляют циклом событий
+    event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, event.set)
+        except NotImplementedError:
+            pass
+    return event
+
+
+async def run_webhook(
+    application: Application,
+    settings: Dict[str, Any],
+    drop_pending_updates: bool = True,
+    secret_token: Optional[str] = None,
+    register: bool = True,
+):
+    # register=False — обновления приходят не от Telegram, а от главного процесса (см. cluster.py)
+    if secret_token is None:
+        secret_token = os.getenv('TELEGRAM_WEBHOOK_SECRET')
+    path = settings.get('path', '/telegram')
+
+    async def process_update(data: Dict[str, Any]):
+        # Ответ Telegram отправляется сразу, обработка идёт через очередь приложения
+        await application.update_queue.put(Update.de_json(data, application.bot))
+
+    server = WebhookServer(
+        process_update,
+        secret_token=secret_token,
+        path=path,
+        health_path=settings.get('health_path', '/health'),
+        host=settings.get('listen', '0.0.0.0'),
+        port=settings.get('port', 8080),
+    )
+
+    stopped = stop_event()
+
+    async with application:
+        # post_init/post_shutdown вызываются только run_polling/run_webhook, поэтому вызываем их сами
+        if application.post_init:
+            await application.post_init(application)
+
+        if register:
+            await application.bot.set_webhook(
+                url=settings['url'],
+                secret_token=secret_token,
+                allowed_updates=Update.ALL_TYPES,
+                drop_pending_updates=drop_pending_updates
+            )
+        await application.start()
+        await server.start()
+        logger.info("Бот работает в режиме вебхука: %s", settings.get('url') or f"{server.http_server.host}:{server.http_server.bound_port}")
+
+        try:
+            await stopped.wait()
+        finally:
+            logger.info("Остановка вебхука")
+            await server.stop()
+            await application.stop()
+            if application.post_stop:
+                await application.post_stop(application)
+
+    if application.post_shutdown:
+        await application.post_shutdown(application)
@@ -0,0 +1,113 @@
+# src/webhook_harness.py
+#
+# Локальная проверка вебхук-сервера без доступа к сети:
+#   python -m src.webhook_harness
+# или отправка синтетических обновлений в уже запущенный экземпляр:
+#   python -m src.webhook_harness --url http://127.0.0.1:8080/telegram --secret <token>
+
+import argparse
+import asyncio
+import logging
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
+from .webhook import SECRET_HEADER, WebhookServer
+
+logger = logging.getLogger(__name__)
+
+
+def synthetic_updates(count: int = 3) -> List[Dict]:
+    now = int(time.time())
+    user = {'id': 1001, 'is_bot': False, 'first_name': 'Test', 'language_code': 'en'}
+    chat = {'id': 1001, 'type': 'private', 'first_name': 'Test'}
+    updates = [{
+        'update_id': 1,
+        'message': {
+            'message_id': 1, 'date': now, 'chat': chat, 'from': user, 'text': '/start',
+            'entities': [{'type': 'bot_command', 'offset': 0, 'length': 6}],
+        },
+    }]
+    for i in range(count - 1):
+        updates.append({
+            'update_id': i + 2,
+            'callback_query': {
+                'id': str(i + 2), 'chat_instance': '1', 'from': user,
+                'data': 'manufacturers' if i % 2 == 0 else 'manufacturers_page:1',
+                'message': {'message_id': 1, 'date': now, 'chat': chat, 'text': 'menu'},
+            },
+        })
+    return updates
+
+
+async def run_checks(url: str, health_url: Optional[str], secret: Optional[str], count: int) -> List[Tuple[str, bool, str]]:
+    results = []
+
+    def check(name: str, ok: bool, detail: str = ''):
+        results.append((name, ok, detail))
+
+    headers = {SECRET_HEADER: secret} if secret else {}
+    async with httpx.AsyncClient(timeout=5) as client:
+        for update in synthetic_updates(count):
+            response = await client.post(url, json=update, headers=headers)
+            check(f"update {update['update_id']} принят", response.status_code == 200, str(response.status_code))
+
+        if secret:
+            response = await client.post(url, json=synthetic_updates(1)[0], headers={SECRET_HEADER: 'wrong'})
+            check("неверный секрет отклонён", response.status_code == 403, str(response.status_code))
+
+        response = await client.post(url, content=b'{not json', headers=headers)
+        check("некорректный JSON отклонён", response.status_code == 400, str(response.status_code))
+
+        response = await client.get(url)
+        check("GET на путь вебхука запрещён", response.status_code == 405, str(response.status_code))
+
+        if health_url:
+            response = await client.get(health_url)
+            check("health отвечает", response.status_code == 200, response.text)
+
+    return results
+
+
+async def self_test(count: int) -> List[Tuple[str, bool, str]]:
+    received = []
+
+    async def process_update(data: Dict):
+        received.append(data)
+
+    server = WebhookServer(process_update, secret_token='harness-secret', port=0)
+    await server.start()
+    base = f"http://127.0.0.1:{server.http_server.bound_port}"
+    try:
+        results = await run_checks(f"{base}{server.path}", f"{base}{server.health_path}", 'harness-secret', count)
+    finally:
+        await server.stop()
+
+    results.append(("все обновления доставлены", len(received) == count, f"{len(received)}/{count}"))
+    results.append(("порядок сохранён", [u['update_id'] for u in received] == list(range(1, count + 1)), ''))
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Проверка вебхук-сервера синтетическими обновлениями")
+    parser.add_argument('--url', help="URL вебхука запущенного бота; без него поднимается локальный сервер")
+    parser.add_argument('--health-url', help="URL health-эндпоинта запущенного бота")
+    parser.add_argument('--secret', help="Секретный токен вебхука")
+    parser.add_argument('--count', type=int, default=5, help="Количество синтетических обновлений")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+    if args.url:
+        results = asyncio.run(run_checks(args.url, args.health_url, args.secret, args.count))
+    else:
+        results = asyncio.run(self_test(args.count))
+
+    for name, ok, detail in results:
+        print(f"[{'OK' if ok else 'FAIL'}] {name} {detail}".rstrip())
+    return 0 if all(ok for _, ok, _ in results) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
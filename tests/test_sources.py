@@ -0,0 +1,52 @@
+# tests/test_sources.py
+
+import json
+import os
+import tempfile
+import unittest
+
+from src.catalog import ModelIndex
+from src.sources import FileSource, SqliteSource, import_catalog
+
+MODELS = [
+    {'name': 'Dup', 'dpi': 1},
+    {'name': 'Other', 'dpi': 2},
+    {'name': 'Dup', 'dpi': 3},
+]
+
+
+class DuplicateModelNamesTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.file_path = os.path.join(self.directory.name, 'acme.json')
+        with open(self.file_path, 'w', encoding='utf-8') as f:
+            json.dump({'models': MODELS}, f)
+        self.db_path = os.path.join(self.directory.name, 'catalog.db')
+        import_catalog(self.db_path, [{'model': 'acme'}], [('acme', MODELS)])
+
+    async def load_index(self, source, url: str) -> ModelIndex:
+        try:
+            response = await source.load(url)
+        finally:
+            await source.close()
+        return ModelIndex.from_raw(response.data['models'], 'acme')
+
+    async def test_sqlite_matches_file_source(self):
+        from_file = await self.load_index(FileSource(), f'file://{self.file_path}')
+        from_sqlite = await self.load_index(SqliteSource(), f'sqlite://{self.db_path}?models=acme')
+
+        self.assertEqual(from_sqlite.items, from_file.items)
+        self.assertEqual([m.name for m in from_sqlite.items], ['Dup', 'Other', 'Dup'])
+        # По названию, как и в остальных источниках, находится первая запись
+        self.assertEqual(from_sqlite.get('Dup').dpi, 1)
+        self.assertEqual(from_sqlite.get('Dup'), from_file.get('Dup'))
+
+    async def test_reimport_replaces_rows(self):
+        import_catalog(self.db_path, [{'model': 'acme'}], [('acme', MODELS[:2])])
+        from_sqlite = await self.load_index(SqliteSource(), f'sqlite://{self.db_path}?models=acme')
+        self.assertEqual([m.name for m in from_sqlite.items], ['Dup', 'Other'])
+
+
+if __name__ == '__main__':
+    unittest.main()